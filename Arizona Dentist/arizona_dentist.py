@@ -1,207 +1,737 @@
 
-import pandas as pd
+import argparse
+import asyncio
+import csv
+import os
 import random
 import requests
+import sys
+import threading
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qs, urlsplit
+from aiohttp import ClientError, ClientSession, ClientTimeout, CookieJar, TCPConnector
 from bs4 import BeautifulSoup
 import time
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import DuplicateKeyError
 import logging
 
+# Make the shared modules in the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limiter import AdaptiveRateLimiter, THROTTLE_STATUSES
 
-#The list of the dentist profiles is collected by querying by the alphabets (A*, B*). website: 'https://azbodv7prod.glsuite.us/GLSuiteWeb/clients/azbod/public/WebVerificationSearch.aspx'
 
-# import requests
-# from bs4 import BeautifulSoup
-# import pandas as pd
+# Base URL and headers
+base_url = "https://azbodv7prod.glsuite.us/GLSuiteWeb/Clients/AZBOD/public/"
+search_url = base_url + "WebVerificationSearch.aspx"
+search_results_url = base_url + "WebVerificationSearchResultsPRO.aspx"
+
+# The profile link list is collected by searching last name prefixes (A*, B*, ...).
+# A prefix whose result page is full is split into longer prefixes.
+first_prefix_letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+next_prefix_letters = first_prefix_letters + " '-"
+max_prefix_length = 6
+user_agents = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 15_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.2 Mobile/15E148 Safari/604.1",
+]
 
-# # Target URL
-# url = "https://azbodv7prod.glsuite.us/GLSuiteWeb/Clients/AZBOD/public/WebVerificationSearchResultsPRO.aspx"
+# Text of the pages the site shows instead of the requested one when a session is no longer valid
+session_error_markers = ("session has expired", "session timed out", "please log in", "an error has occurred", "runtime error")
 
-# # Headers
-# headers = {
-#     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-#     "Referer": "https://azbodv7prod.glsuite.us/GLSuiteWeb/clients/azbod/public/WebVerificationSearch.aspx",
-#     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-#     "Accept-Encoding": "gzip, deflate, br, zstd",
-#     "Accept-Language": "en-US,en;q=0.9",
-#     "Connection": "keep-alive"
-# }
 
-# # Cookies
-# cookies = {
-#     "ASP.NET_SessionId": "2ig404aomegllnmhivdrgxzo",
-#     "ApplicationGatewayAffinity": "2279ae3f0487f000d1cefab7e8ce8c97",
-#     "ApplicationGatewayAffinityCORS": "2279ae3f0487f000d1cefab7e8ce8c97"
-# }
+def build_headers():
+    """Return request headers with a randomly selected User-Agent."""
+    return {
+        "User-Agent": random.choice(user_agents),
+        "Referer": base_url,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Connection": "keep-alive"
+    }
 
-# # Make the GET request
-# response = requests.get(url, headers=headers, cookies=cookies)
 
-# # Check response
-# if response.status_code == 200:
-#     print("Request successful!")
-    
-#     # Parse the response text
-#     soup = BeautifulSoup(response.text, "html.parser")
+def parse_profile_page(html):
+    """Extract the general, license and certification details from a profile page.
 
-#     # Find all <a> tags inside the results table
-#     name_link_list = []
-#     table = soup.find("table", {"id": "ContentPlaceHolder1_dtgGeneral"})  # Locate the table
-#     if table:
-#         for row in table.find_all("tr")[1:]:  # Skip the header row
-#             link_tag = row.find("a")
-#             if link_tag and "href" in link_tag.attrs:
-#                 name = link_tag.get_text(strip=True)
-#                 link = link_tag["href"]
-#                 name_link_list.append({"Name": name, "Profile Link": link})
+    Returns:
+        dict or None: The profile data, or None if the page has no phone number.
+    """
+    soup = BeautifulSoup(html, "html.parser")
 
-#     # Create a DataFrame from the list
-#     df_Z = pd.DataFrame(name_link_list)
+    # Extract General Information
+    general_info = []
+    general_table = soup.find("table", {"id": "ContentPlaceHolder1_dtgGeneralN"})
+    if general_table:
+        for row in general_table.find_all("tr"):
+            info = row.get_text(strip=True)
+            general_info.append(info)
 
-#     # Display the DataFrame
-#     print(df_Z)
+    general_details = {
+        "Name": general_info[0] if len(general_info) > 0 else None,
+        "Address": ", ".join(general_info[1:3]) if len(general_info) > 2 else None,
+        "Phone Number": general_info[3] if len(general_info) > 3 else None
+    }
 
+    # Skip if no phone number
+    if not general_details["Phone Number"]:
+        return None
+
+    # Extract License Information
+    license_info = {}
+    license_table = soup.find("table", {"id": "ContentPlaceHolder1_dtgGeneral"})
+    if license_table:
+        for row in license_table.find_all("tr"):
+            cells = row.find_all("td")
+            if len(cells) == 2:
+                key = cells[0].get_text(strip=True).replace("License Number", "").strip()
+                value = cells[1].get_text(strip=True)
+                if key and key != ":":  # Skip any empty or malformed keys
+                    license_info[key] = value
+
+    # Extract Certifications
+    certifications = []
+    certification_name = soup.find("input", {"id": "ContentPlaceHolder1_tbNameCert1"})
+    if certification_name:
+        certification = {"Certification Name": certification_name.get("value", "").strip()}
+        certification_table = soup.find("table", {"id": "ContentPlaceHolder1_dtgCert1"})
+        if certification_table:
+            for row in certification_table.find_all("tr"):
+                cells = row.find_all("td")
+                if len(cells) == 2:
+                    key = cells[0].get_text(strip=True).replace(":", "")
+                    value = cells[1].get_text(strip=True)
+                    certification[key] = value
+        certifications.append(certification)
+
+    # Flatten Certifications into separate columns
+    certification_columns = {}
+    if certifications:
+        for i, cert in enumerate(certifications, start=1):
+            for key, value in cert.items():
+                certification_columns[f"Certification {i} - {key}"] = value
+
+    # Combine all extracted data
+    return {
+        "Name": general_details["Name"],
+        "Address": general_details["Address"],
+        "Phone Number": general_details["Phone Number"],
+        **license_info,  # Add license info into separate columns (excluding License Number)
+        **certification_columns  # Add certifications as separate columns
+    }
 
-# else:
-#     print(f"Request failed with status code: {response.status_code}")
 
+def parse_search_results(html):
+    """Return the (name, profile link) pairs listed on a search results page."""
+    soup = BeautifulSoup(html, "html.parser")
+    name_link_list = []
+    table = soup.find("table", {"id": "ContentPlaceHolder1_dtgGeneral"})
+    if table:
+        for row in table.find_all("tr")[1:]:  # Skip the header row
+            link_tag = row.find("a")
+            if link_tag and "href" in link_tag.attrs:
+                name_link_list.append((link_tag.get_text(strip=True), link_tag["href"]))
+    return name_link_list
+
+
+def build_search_form(html, last_name):
+    """Build the postback data of the search page for a last name search.
+
+    Hidden ASP.NET fields (view state, event validation) and drop-down selections are
+    copied from the page, the last name box is set to `last_name`, and the search
+    button is pressed.
+
+    Raises:
+        ValueError: If the page has no last name box or search button.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    form = {}
+    name_field = None
+    button = None
+    for field in soup.find_all("input"):
+        field_name = field.get("name")
+        if not field_name:
+            continue
+        field_type = (field.get("type") or "text").lower()
+        if field_type == "hidden":
+            form[field_name] = field.get("value", "")
+        elif field_type == "text":
+            form[field_name] = ""
+            if name_field is None and "lastname" in field_name.lower().replace("_", ""):
+                name_field = field_name
+        elif field_type == "submit" and button is None and "search" in f"{field_name} {field.get('value', '')}".lower():
+            button = (field_name, field.get("value", ""))
+    for select in soup.find_all("select"):
+        if select.get("name"):
+            option = select.find("option", selected=True) or select.find("option")
+            form[select["name"]] = option.get("value", "") if option else ""
+
+    if name_field is None or button is None:
+        raise ValueError("Search page has no last name field or search button.")
+    form[name_field] = last_name
+    form[button[0]] = button[1]
+    return form
+
+
+def entity_id(profile_link):
+    """Return the EntityID query parameter of a profile link, or an empty string."""
+    return parse_qs(urlsplit(profile_link).query).get("EntityID", [""])[0]
+
+
+def profile_key(profile_link):
+    """Return the key of a profile link: its EntityID and LicenseID, or the link itself if they are missing."""
+    query = parse_qs(urlsplit(profile_link).query)
+    entity_id = query.get("EntityID", [""])[0]
+    license_id = query.get("LicenseID", [""])[0]
+    if not entity_id or not license_id:
+        return profile_link
+    return f"{entity_id}-{license_id}"
+
+
+class ProgressLog:
+    """Append-only file with the keys of the profiles that have been fully processed.
+
+    A profile is recorded once it is stored, or once it is known that it never will be
+    (no phone number, duplicate phone number). Failed fetches are not recorded, so a
+    rerun tries them again. Writes are flushed line by line and may come from worker threads.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.keys = set()
+        if os.path.exists(file_path):
+            with open(file_path, encoding="utf-8") as file:
+                self.keys.update(line.strip() for line in file if line.strip())
+        self._lock = threading.Lock()
+        self._file = open(file_path, "a", encoding="utf-8")
+
+    def add(self, key):
+        with self._lock:
+            self._file.write(f"{key}\n")
+            self._file.flush()
+            self.keys.add(key)
+
+    def close(self):
+        self._file.close()
+
+
+def load_stored_keys(collection):
+    """Return the keys of the profiles already stored in MongoDB."""
+    stored = collection.find({"EntityID": {"$exists": True}}, {"_id": 0, "EntityID": 1, "LicenseID": 1})
+    return {f"{doc['EntityID']}-{doc.get('LicenseID', '')}" for doc in stored}
+
+
+def pending_link(name, profile_link, done_keys):
+    """Return the (key, name, absolute link) of a row still to fetch, or None if it is done."""
+    if not profile_link.startswith("https://"):
+        profile_link = base_url + profile_link
+    key = profile_key(profile_link)
+    if key in done_keys:
+        return None
+    done_keys.add(key)
+    return key, name, profile_link
+
+
+def iter_pending_links(file_path, done_keys):
+    """Stream the link file and yield the profiles that still have to be fetched.
+
+    Rows are read one at a time. Rows whose key is in `done_keys` are skipped, and every
+    yielded key is added to it, so repeated rows in the file are only fetched once.
+
+    Yields:
+        tuple: (key, name, absolute profile link)
+    """
+    skipped = 0
+    with open(file_path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            item = pending_link(row["Name"], row["Profile Link"], done_keys)
+            if item is None:
+                skipped += 1
+                continue
+            yield item
+    logging.info(f"Skipped {skipped} links that were already processed.")
 
-df_all_profiles=pd.read_csv('all_profile_link.csv')
 
+def store_profile_page(collection, html, name, key, progress):
+    """Parse a profile page and insert it into MongoDB, skipping pages without a phone number.
 
-# Base URL and headers
-base_url = "https://azbodv7prod.glsuite.us/GLSuiteWeb/Clients/AZBOD/public/"
-user_agents = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36",
-    "Mozilla/5.0 (iPhone; CPU iPhone OS 15_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.2 Mobile/15E148 Safari/604.1",
-]
+    The profile is recorded in `progress` unless the insert failed for another reason
+    than a duplicate phone number.
+    """
+    profile_data = parse_profile_page(html)
+    if profile_data is None:
+        logging.info(f"Skipping {name} due to missing phone number.")
+        progress.add(key)
+        return
 
-cookies = {
-    "ASP.NET_SessionId": "2ig404aomegllnmhivdrgxzo",
-    "ApplicationGatewayAffinity": "2279ae3f0487f000d1cefab7e8ce8c97",
-    "ApplicationGatewayAffinityCORS": "2279ae3f0487f000d1cefab7e8ce8c97"
-}
+    entity_id, _, license_id = key.partition("-")
+    if license_id:
+        profile_data["EntityID"] = entity_id
+        profile_data["LicenseID"] = license_id
 
+    # Insert the profile data into MongoDB
+    try:
+        collection.insert_one(profile_data)
+    except DuplicateKeyError as e:
+        logging.warning(f"Skipping duplicate phone number for {name}: {e}")
+    except Exception as e:
+        logging.error(f"Failed to insert {name}: {e}")
+        return
+    progress.add(key)
 
-# Configure logging
-logging.basicConfig(filename="arizona_script.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-client = MongoClient("mongodb://127.0.0.1:27017/")
+class SessionExpired(Exception):
+    """Raised when the site answers with a login or error page instead of the requested page."""
+    pass
 
-# Select the appropriate database and collection
-db = client["eat-right_counselor_marketing"]
-collection = db["dentist_profiles"] 
 
-# Ensure unique index on "Phone Number"
-collection.create_index("Phone Number", unique=True)
+def is_session_error_page(html):
+    """Return True if `html` is a login or error page rather than a page of the site's content area."""
+    if "ContentPlaceHolder1" not in html:
+        return True
+    text = html.lower()
+    return any(marker in text for marker in session_error_markers)
 
-profile_data_list = []
 
-# Correct the URLs in the DataFrame by appending the base URL
-df_all_profiles["Profile Link"] = df_all_profiles["Profile Link"].apply(lambda link: base_url + link if not link.startswith("https://") else link)
+def check_session_page(html, name):
+    """Return `html`, or raise SessionExpired if it is a login or error page."""
+    if html is not None and is_session_error_page(html):
+        raise SessionExpired(f"Session returned a login or error page for {name}.")
+    return html
 
-# Process each corrected URL
-for _, row in df_all_profiles.iterrows():
-    profile_link = row["Profile Link"]
-    name = row["Name"]
 
-    # Randomly select a User-Agent
-    headers = {
-        "User-Agent": random.choice(user_agents),
-        "Referer": base_url,
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Connection": "keep-alive"
-    }
+def open_requests_session():
+    """Open a requests session with fresh site cookies by loading the search page."""
+    session = requests.Session()
+    response = session.get(search_url, headers=build_headers())
+    response.raise_for_status()
+    return session
 
-    logging.info(f"Processing: {name} - {profile_link}")
 
-    try:
-        # Fetch profile page
-        response = requests.get(profile_link, headers=headers, cookies=cookies)
-
-        if response.status_code == 200:
-            # Parse the profile page
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Extract General Information
-            general_info = []
-            general_table = soup.find("table", {"id": "ContentPlaceHolder1_dtgGeneralN"})
-            if general_table:
-                for row in general_table.find_all("tr"):
-                    info = row.get_text(strip=True)
-                    general_info.append(info)
-
-            general_details = {
-                "Name": general_info[0] if len(general_info) > 0 else None,
-                "Address": ", ".join(general_info[1:3]) if len(general_info) > 2 else None,
-                "Phone Number": general_info[3] if len(general_info) > 3 else None
-            }
-
-            # Skip if no phone number
-            if not general_details["Phone Number"]:
-                logging.info(f"Skipping {name} due to missing phone number.")
-                continue
+def scrape_sequential(links, collection, progress):
+    """Fetch the profiles one at a time with a random 1-3 second pause between them."""
+    session = open_requests_session()
+    for key, name, profile_link in links:
+        logging.info(f"Processing: {name} - {profile_link}")
+
+        try:
+            # Fetch profile page, opening a new session once if the current one has expired
+            response = session.get(profile_link, headers=build_headers())
+            if response.status_code == 200 and is_session_error_page(response.text):
+                logging.warning(f"Session returned a login or error page for {name}. Opening a new session.")
+                session = open_requests_session()
+                response = session.get(profile_link, headers=build_headers())
 
-            # Extract License Information
-            license_info = {}
-            license_table = soup.find("table", {"id": "ContentPlaceHolder1_dtgGeneral"})
-            if license_table:
-                for row in license_table.find_all("tr"):
-                    cells = row.find_all("td")
-                    if len(cells) == 2:
-                        key = cells[0].get_text(strip=True).replace("License Number", "").strip()
-                        value = cells[1].get_text(strip=True)
-                        if key and key != ":":  # Skip any empty or malformed keys
-                            license_info[key] = value
-
-            # Extract Certifications
-            certifications = []
-            certification_name = soup.find("input", {"id": "ContentPlaceHolder1_tbNameCert1"})
-            if certification_name:
-                certification = {"Certification Name": certification_name.get("value", "").strip()}
-                certification_table = soup.find("table", {"id": "ContentPlaceHolder1_dtgCert1"})
-                if certification_table:
-                    for row in certification_table.find_all("tr"):
-                        cells = row.find_all("td")
-                        if len(cells) == 2:
-                            key = cells[0].get_text(strip=True).replace(":", "")
-                            value = cells[1].get_text(strip=True)
-                            certification[key] = value
-                certifications.append(certification)
-
-            # Flatten Certifications into separate columns
-            certification_columns = {}
-            if certifications:
-                for i, cert in enumerate(certifications, start=1):
-                    for key, value in cert.items():
-                        certification_columns[f"Certification {i} - {key}"] = value
-
-            # Combine all extracted data
-            profile_data = {
-                "Name": general_details["Name"],
-                "Address": general_details["Address"],
-                "Phone Number": general_details["Phone Number"],
-                **license_info,  # Add license info into separate columns (excluding License Number)
-                **certification_columns  # Add certifications as separate columns
-            }
-
-            # Insert the profile data into MongoDB
+            if response.status_code == 200 and is_session_error_page(response.text):
+                logging.error(f"New session also returned a login or error page for {name}.")
+            elif response.status_code == 200:
+                store_profile_page(collection, response.text, name, key, progress)
+            else:
+                logging.warning(f"Failed to fetch profile page for {name} with status code: {response.status_code}")
+
+        except Exception as e:
+            logging.error(f"Error processing {name}: {e}")
+
+        # Add a random delay between 1 and 3 seconds
+        time.sleep(random.uniform(1, 3))
+
+
+async def fetch_page(session, limiter, url, name, method="GET", data=None, max_retries=3):
+    """Fetch one page through the shared rate limiter, retrying throttled requests.
+
+    Returns:
+        str or None: The page HTML, or None if it could not be fetched.
+    """
+    for attempt in range(1, max_retries + 1):
+        async with limiter:
+            started = time.monotonic()
             try:
-                collection.insert_one(profile_data)
-            except Exception as e:
-                logging.warning(f"Skipping duplicate phone number for {name}: {e}")
+                async with session.request(method, url, headers=build_headers(), data=data) as response:
+                    limiter.record(response.status, time.monotonic() - started, response.headers.get('Retry-After'))
+                    if response.status == 200:
+                        return await response.text()
+                    if response.status not in THROTTLE_STATUSES:
+                        logging.warning(f"Failed to fetch page for {name} with status code: {response.status}")
+                        return None
+                    logging.warning(f"Throttled with status {response.status} on {name} (attempt {attempt}/{max_retries}).")
+            except (ClientError, asyncio.TimeoutError) as e:
+                limiter.record(None)
+                logging.warning(f"Error fetching {name} (attempt {attempt}/{max_retries}): {e}")
+    logging.error(f"Giving up on {name} after {max_retries} attempts.")
+    return None
+
+
+class SessionPool:
+    """Small pool of warm GL Suite sessions, each with its own cookies and server-side state.
+
+    A session is opened by loading the search page, which sets the ASP.NET session and
+    gateway affinity cookies. Workers lease a session for exclusive use, so parallel
+    requests never share one server-side session. A session whose lease ends with
+    `SessionExpired` is closed, and a fresh one is opened for the next lease.
+    """
+
+    def __init__(self, limiter, size=4, max_open_attempts=3):
+        """
+        Args:
+            limiter (AdaptiveRateLimiter): The rate limiter for every request, including bootstrapping.
+            size (int): Maximum number of sessions, and so of leases at a time.
+            max_open_attempts (int): Attempts at opening a session before giving up.
+        """
+        self.limiter = limiter
+        self.size = max(1, size)
+        self.max_open_attempts = max_open_attempts
+        self._slots = asyncio.Semaphore(self.size)
+        self._idle = []
+        self.opened = 0
+        self.replaced = 0
+
+    async def _open(self):
+        for attempt in range(1, self.max_open_attempts + 1):
+            session = ClientSession(
+                connector=TCPConnector(limit=2), cookie_jar=CookieJar(), timeout=ClientTimeout(total=60)
+            )
+            html = await fetch_page(session, self.limiter, search_url, "session bootstrap")
+            if html is not None and not is_session_error_page(html):
+                if not any(cookie.key == "ASP.NET_SessionId" for cookie in session.cookie_jar):
+                    logging.warning("Search page did not set an ASP.NET_SessionId cookie.")
+                self.opened += 1
+                return session
+            await session.close()
+            logging.warning(f"Could not open a session (attempt {attempt}/{self.max_open_attempts}).")
+            await asyncio.sleep(2 ** attempt)
+        raise SessionExpired("Could not open a new session.")
+
+    async def start(self):
+        """Open every session of the pool up front."""
+        sessions = await asyncio.gather(*(self._open() for _ in range(self.size - len(self._idle))))
+        self._idle.extend(sessions)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a session for exclusive use; it is replaced if the lease ends with SessionExpired."""
+        await self._slots.acquire()
+        session = None
+        try:
+            session = self._idle.pop() if self._idle else await self._open()
+            yield session
+        except SessionExpired:
+            if session is not None:
+                await session.close()
+                self.replaced += 1
+                session = None
+            raise
+        finally:
+            if session is not None:
+                self._idle.append(session)
+            self._slots.release()
+
+    async def call(self, func, *args, attempts=3):
+        """Return `await func(session, *args)` on a leased session.
+
+        When `func` raises SessionExpired, the session is replaced and the call retried
+        up to `attempts` times; None is returned if every attempt fails.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                async with self.lease() as session:
+                    return await func(session, *args)
+            except SessionExpired as e:
+                logging.warning(f"{e} Replacing the session (attempt {attempt}/{attempts}).")
+        logging.error(f"Giving up after {attempts} sessions failed.")
+        return None
 
+    async def close(self):
+        """Close the idle sessions."""
+        while self._idle:
+            await self._idle.pop().close()
+        logging.info(f"Session pool closed: {self.opened} sessions opened, {self.replaced} replaced.")
+
+
+async def fetch_profile(session, limiter, profile_link, name):
+    """Fetch a profile page, raising SessionExpired if the session is no longer valid."""
+    return check_session_page(await fetch_page(session, limiter, profile_link, name), name)
+
+
+async def search_prefix(session, limiter, prefix):
+    """Run a last name search for `prefix*` and return the listed (name, profile link) pairs.
+
+    The search criteria are kept in the server-side session, so `session` must not be
+    used for another search at the same time.
+
+    Returns:
+        list or None: The results, or None if the search failed.
+
+    Raises:
+        SessionExpired: If the site answers with a login or error page.
+    """
+    html = check_session_page(await fetch_page(session, limiter, search_url, f"search {prefix}"), f"search {prefix}")
+    if html is None:
+        return None
+    try:
+        form = build_search_form(html, f"{prefix}*")
+    except ValueError as e:
+        logging.error(f"Cannot search {prefix}: {e}")
+        return None
+
+    html = check_session_page(
+        await fetch_page(session, limiter, search_url, f"search {prefix}", method="POST", data=form), f"search {prefix}"
+    )
+    if html is not None and "ContentPlaceHolder1_dtgGeneral" not in html:
+        # The postback did not land on the results page; it is shown for the session's last search
+        html = check_session_page(
+            await fetch_page(session, limiter, search_results_url, f"search {prefix}"), f"search {prefix}"
+        )
+    if html is None:
+        return None
+    return parse_search_results(html)
+
+
+def load_link_ids(file_path):
+    """Return the EntityIDs already listed in the link file."""
+    if not os.path.exists(file_path):
+        return set()
+    with open(file_path, newline="", encoding="utf-8") as file:
+        return {entity_id(row["Profile Link"]) for row in csv.DictReader(file)}
+
+
+async def harvest_profile_links(file_path, limiter, workers=4, page_limit=500, on_link=None):
+    """Collect the profile links by searching name prefixes in parallel and append them to the link file.
+
+    Every worker leases its own session from a `SessionPool`, because the site keeps
+    the search in the server-side session. A prefix whose result page holds `page_limit` or more rows is
+    split into longer prefixes. Links are deduplicated by EntityID against the file and
+    each other, and every new row is written and flushed right away, so the detail
+    scraper can work on the file while the harvest is still running.
+
+    Args:
+        file_path (str): The link file, created with a header if it does not exist.
+        limiter (AdaptiveRateLimiter): The rate limiter shared by all requests.
+        workers (int): Number of prefixes searched at the same time.
+        page_limit (int): Result count at which a prefix counts as truncated.
+        on_link (coroutine function, optional): Awaited with (name, link) for each new link.
+
+    Returns:
+        int: The number of new links.
+    """
+    known_ids = load_link_ids(file_path)
+    write_header = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+    prefixes = asyncio.Queue()
+    for letter in first_prefix_letters:
+        prefixes.put_nowait(letter)
+    new_links = 0
+    failed = []
+
+    with open(file_path, "a", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if write_header:
+            writer.writerow(["Name", "Profile Link"])
+            file.flush()
+
+        pool = SessionPool(limiter, size=workers)
+
+        async def worker():
+            nonlocal new_links
+            while True:
+                prefix = await prefixes.get()
+                try:
+                    results = await pool.call(search_prefix, limiter, prefix)
+                    if results is None:
+                        failed.append(prefix)
+                        continue
+                    if len(results) >= page_limit:
+                        if len(prefix) < max_prefix_length:
+                            logging.info(f"Prefix {prefix!r} returned a full page of {len(results)} results. Searching longer prefixes.")
+                            for letter in next_prefix_letters:
+                                prefixes.put_nowait(prefix + letter)
+                        else:
+                            logging.warning(f"Prefix {prefix!r} is still full at {len(results)} results; some links may be missing.")
+                    added = 0
+                    for name, link in results:
+                        link_id = entity_id(link) or link
+                        if link_id in known_ids:
+                            continue
+                        known_ids.add(link_id)
+                        writer.writerow([name, link])
+                        added += 1
+                        if on_link is not None:
+                            await on_link(name, link)
+                    file.flush()
+                    new_links += added
+                    logging.info(f"Prefix {prefix!r}: {len(results)} results, {added} new links.")
+                except Exception as e:
+                    failed.append(prefix)
+                    logging.error(f"Error searching prefix {prefix!r}: {e}")
+                finally:
+                    prefixes.task_done()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(pool.size)]
+        try:
+            await prefixes.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await pool.close()
+
+    if failed:
+        logging.warning(f"Searches failed for prefixes {sorted(failed)}; run the harvest again to retry them.")
+    logging.info(f"Harvest finished: {new_links} new links written to {file_path}.")
+    return new_links
+
+
+async def scrape_concurrent(links, collection, progress, workers=8, rate=4.0, limiter=None):
+    """Fetch the profiles with `workers` parallel requests over a pool of warm sessions.
+
+    Each worker leases its own keep-alive session from a `SessionPool` for every profile,
+    and expired sessions are replaced automatically. The per-row sleep is replaced by one adaptive rate limiter shared by every worker,
+    capped at `rate` requests per second. Parsing and MongoDB inserts run on worker
+    threads so they do not hold up the requests in flight.
+
+    Args:
+        links (iterable or async iterable): (key, name, profile link) tuples, as yielded
+            by `iter_pending_links`.
+        collection (Collection): The MongoDB collection to insert into.
+        progress (ProgressLog): Records the profiles that have been processed.
+        workers (int): Number of profiles fetched at the same time.
+        rate (float): Maximum number of requests per second across all workers.
+        limiter (AdaptiveRateLimiter, optional): A limiter shared with other tasks. Defaults
+            to a new one capped at `rate`.
+    """
+    limiter = limiter or make_limiter(rate)
+    queue = asyncio.Queue(maxsize=workers * 2)
+    loop = asyncio.get_running_loop()
+
+    async def producer():
+        if hasattr(links, "__aiter__"):
+            async for item in links:
+                await queue.put(item)
         else:
-            logging.warning(f"Failed to fetch profile page for {name} with status code: {response.status_code}")
+            for item in links:
+                await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            key, name, profile_link = item
+            logging.info(f"Processing: {name} - {profile_link}")
+            try:
+                html = await pool.call(fetch_profile, limiter, profile_link, name)
+                if html is not None:
+                    await loop.run_in_executor(None, store_profile_page, collection, html, name, key, progress)
+            except Exception as e:
+                logging.error(f"Error processing {name}: {e}")
 
-    except Exception as e:
-        logging.error(f"Error processing {name}: {e}")
+    pool = SessionPool(limiter, size=workers)
+    try:
+        await pool.start()
+        await asyncio.gather(producer(), *(worker() for _ in range(workers)))
+    finally:
+        await pool.close()
+
+
+def make_limiter(rate):
+    """Return an adaptive rate limiter capped at `rate` requests per second."""
+    return AdaptiveRateLimiter(rate=rate, per=1, min_rate=min(0.5, rate), max_rate=rate, increase=0.1, name='arizona')
+
+
+async def harvest_and_scrape(args, collection, progress, done_keys):
+    """Harvest the link file and fetch the profiles at the same time, sharing one rate limit.
+
+    Links already in the file are fetched first, then new links as the harvest finds them.
+    """
+    limiter = make_limiter(args.rate)
+    harvested = asyncio.Queue()
+
+    async def on_link(name, link):
+        await harvested.put((name, link))
+
+    async def harvest():
+        try:
+            await harvest_profile_links(
+                args.links, limiter, workers=args.harvest_workers, page_limit=args.page_limit, on_link=on_link
+            )
+        finally:
+            await harvested.put(None)
+
+    async def links():
+        if os.path.exists(args.links):
+            for item in iter_pending_links(args.links, done_keys):
+                yield item
+        while True:
+            row = await harvested.get()
+            if row is None:
+                return
+            item = pending_link(*row, done_keys)
+            if item is not None:
+                yield item
+
+    await asyncio.gather(
+        harvest(),
+        scrape_concurrent(links(), collection, progress, workers=max(1, args.workers), limiter=limiter)
+    )
+
+
+def parse_args():
+    """Parse the command line options."""
+    parser = argparse.ArgumentParser(description="Scrape Arizona dentist profiles into MongoDB.")
+    parser.add_argument('--concurrent', action='store_true', help="Fetch profiles in parallel over one pooled client instead of one at a time.")
+    parser.add_argument('--workers', type=int, default=8, help="Parallel fetches in concurrent mode (default 8).")
+    parser.add_argument('--rate', type=float, default=4.0, help="Maximum requests per second in concurrent mode (default 4).")
+    parser.add_argument('--links', default='all_profile_link.csv', help="CSV file with the Name and Profile Link columns.")
+    parser.add_argument('--progress-file', default='arizona_progress.log', help="File recording the profiles already processed.")
+    parser.add_argument('--harvest', action='store_true', help="Refresh the link file by searching name prefixes. With --concurrent, profiles are fetched while the harvest runs.")
+    parser.add_argument('--harvest-only', action='store_true', help="Refresh the link file and do not fetch any profiles.")
+    parser.add_argument('--harvest-workers', type=int, default=4, help="Prefixes searched in parallel (default 4).")
+    parser.add_argument('--page-limit', type=int, default=500, help="Result count at which a search counts as truncated and is split into longer prefixes (default 500).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Configure logging
+    logging.basicConfig(filename="arizona_script.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.harvest_only or (args.harvest and not args.concurrent):
+        asyncio.run(harvest_profile_links(
+            args.links, make_limiter(args.rate), workers=max(1, args.harvest_workers), page_limit=args.page_limit
+        ))
+        if args.harvest_only:
+            return
+
+    client = MongoClient("mongodb://127.0.0.1:27017/")
+
+    # Select the appropriate database and collection
+    db = client["eat-right_counselor_marketing"]
+    collection = db["dentist_profiles"]
+
+    # Ensure unique index on "Phone Number"
+    collection.create_index("Phone Number", unique=True)
+    collection.create_index([("EntityID", ASCENDING), ("LicenseID", ASCENDING)])
+
+    # Profiles stored in MongoDB or recorded in the progress file are not fetched again
+    progress = ProgressLog(args.progress_file)
+    done_keys = load_stored_keys(collection) | progress.keys
+    try:
+        if args.harvest and args.concurrent:
+            asyncio.run(harvest_and_scrape(args, collection, progress, done_keys))
+        elif args.concurrent:
+            links = iter_pending_links(args.links, done_keys)
+            asyncio.run(scrape_concurrent(links, collection, progress, workers=max(1, args.workers), rate=args.rate))
+        else:
+            scrape_sequential(iter_pending_links(args.links, done_keys), collection, progress)
+    finally:
+        progress.close()
 
-    # Add a random delay between 1 and 3 seconds
-    time.sleep(random.uniform(1, 3))
+    logging.info("Data insertion into MongoDB completed.")
+    client.close()
 
-logging.info("Data insertion into MongoDB completed.")
 
+if __name__ == "__main__":
+    main()
@@ -9,14 +9,18 @@ from requests.exceptions import RequestException
 import string
 from pymongo import MongoClient, ASCENDING
 from datetime import datetime
+import os
+import sys
+
+# Make the shared modules in the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_logging import RecordLogger, setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Sampled logging for per-profile messages
+record_log = RecordLogger(logger)
+
 class MongoDBHandler:
     def __init__(self, connection_string: str = "mongodb://localhost:27017/",database_name='profession_lead'):
         self.client = MongoClient(connection_string)
@@ -33,7 +37,7 @@ class MongoDBHandler:
             # Check if phone number is valid
             phone = profile.get('Phone', '').strip()
             if phone in ['Not available', '', 'nan', None] or len(phone) < 10:
-                logger.warning(f"Skipping profile for {profile['Name']} - Invalid phone number: {phone}")
+                record_log.event('invalid_phone', "Skipping profile for %s - Invalid phone number: %s", profile['Name'], phone, level=logging.WARNING)
                 return False
                 
             # Add timestamp for tracking
@@ -45,7 +49,7 @@ class MongoDBHandler:
                 {"$set": profile},
                 upsert=True
             )
-            logger.info(f"Successfully upserted profile for {profile['Name']} with phone {phone}")
+            record_log.event('upserted', "Successfully upserted profile for %s with phone %s", profile['Name'], phone)
             return True
         except Exception as e:
             logger.error(f"Failed to upsert profile for {profile['Name']}: {str(e)}")
@@ -180,7 +184,7 @@ class MedicalBoardScraper:
                 
             for link in profile_links:
                 try:
-                    logger.info(f"Scraping profile: {link}")
+                    record_log.event('scraped', "Scraping profile: %s", link)
                     profile_response = self.session.get(link, headers=self.headers)
                     profile_response.raise_for_status()
                     
@@ -218,12 +222,16 @@ class MedicalBoardScraper:
                 logger.error(f"Error processing letter {letter}: {str(e)}")
         
         # Log final statistics
+        record_log.flush()
         logger.info("Scanning completed. Final statistics:")
         logger.info(f"Total profiles scraped: {self.stats['total_scraped']}")
         logger.info(f"Valid profiles stored: {self.stats['valid_profiles']}")
         logger.info(f"Profiles skipped (invalid phone): {self.stats['invalid_phone']}")
 
 def main():
+    # Configure logging; records are written by a background thread
+    setup_logging()
+
     try:
         scraper = MedicalBoardScraper()
         scraper.scan_alphabet()
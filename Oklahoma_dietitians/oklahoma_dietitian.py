@@ -4,14 +4,15 @@ import logging
 import time
 import random
 from pymongo import MongoClient, errors
+import os
+import sys
 
-# Configure logging
-if not logging.getLogger().hasHandlers():
-    logging.basicConfig(
-        filename="scraping.log",
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-    )
+# Make the shared modules in the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scraper_logging import RecordLogger, setup_logging
+
+# Sampled logging for per-profile messages
+record_log = RecordLogger()
 
 def fetch_dietitian_data(mongo_uri="mongodb://127.0.0.1:27017/", database_name="profession_lead", collection_name="Oklahama_dietitians"):
     logging.info("Script started.")
@@ -87,15 +88,15 @@ def fetch_dietitian_data(mongo_uri="mongodb://127.0.0.1:27017/", database_name="
                             if existing_doc:
                                 # Update the existing document
                                 collection.update_one({"Phone #:": phone_field}, {"$set": sanitized_data})
-                                logging.info(f"Updated profile in MongoDB: {sanitized_data}")
+                                record_log.event('updated', "Updated profile in MongoDB: %s", sanitized_data)
                             else:
                                 # Insert a new document
                                 collection.insert_one(sanitized_data)
-                                logging.info(f"Inserted profile into MongoDB: {sanitized_data}")
+                                record_log.event('inserted', "Inserted profile into MongoDB: %s", sanitized_data)
                         except errors.DuplicateKeyError:
-                            logging.warning(f"Duplicate phone number found. Skipping profile: {phone_field}")
+                            record_log.event('duplicates', "Duplicate phone number found. Skipping profile: %s", phone_field, level=logging.WARNING)
                     else:
-                        logging.info(f"Skipped profile (no phone number): {license_data}")
+                        record_log.event('no_phone', "Skipped profile (no phone number): %s", license_data)
 
                 base_payload["current_page"] = str(int(base_payload["current_page"]) + 1)
                 delay = random.uniform(2, 5)
@@ -111,7 +112,11 @@ def fetch_dietitian_data(mongo_uri="mongodb://127.0.0.1:27017/", database_name="
             logging.error(f"Unexpected error: {e}")
             break
 
+    record_log.flush()
     logging.info("Script finished.")
 
 if __name__ == "__main__":
+    # Configure logging; records are written by a background thread
+    if not logging.getLogger().hasHandlers():
+        setup_logging("scraping.log", console=False)
     fetch_dietitian_data()
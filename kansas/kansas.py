@@ -1,26 +1,37 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
 import time
 import logging
 from datetime import datetime
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, UpdateOne
 from requests.adapters import HTTPAdapter
 import random
 from urllib3.util.retry import Retry
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import json
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
-# Set up logging
-logging.basicConfig(
-    filename=f'scraper_log_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Make the shared modules in the repository root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limiter import BlockingRateLimiter
+from scraper_logging import RecordLogger, setup_logging
+
+# Sampled logging for per-row and per-field messages
+record_log = RecordLogger()
 
 class RequestError(Exception):
     """Custom exception for request-related errors"""
     pass
 
+def license_key(doc: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """Return the (profession, license_number) key of a listing row or stored record.
+
+    Stored records have empty strings cleaned to None, so both sides are compared that way.
+    """
+    return doc.get('profession') or None, doc.get('license_number') or None
+
 class MongoDBHandler:
     def __init__(self, connection_string: str, database: str, collection: str):
         self.client = MongoClient(connection_string)
@@ -29,18 +40,74 @@ class MongoDBHandler:
         
         # Create unique index on phone number since we're only storing records with phones
         self.collection.create_index([("Phone", ASCENDING)], unique=True)
+        self.collection.create_index([("profession", ASCENDING), ("license_number", ASCENDING)])
+
+        # Licensees whose details were fetched but not stored (no phone, duplicate phone)
+        self.rejected = self.db[f"{collection}_rejected"]
+        self.rejected.create_index([("profession", ASCENDING), ("license_number", ASCENDING)], unique=True)
+
+    @staticmethod
+    def clean_document(doc: Dict) -> Dict:
+        """Clean empty strings to None for better MongoDB handling"""
+        return {k: (None if v == '' else v) for k, v in doc.items()}
+
+    @staticmethod
+    def license_filter(doc: Dict) -> Dict:
+        """Match the stored record of a listing row, with empty strings cleaned as when stored"""
+        profession, license_number = license_key(doc)
+        return {'profession': profession, 'license_number': license_number}
+
+    def load_license_statuses(self) -> Dict[Tuple[str, str], str]:
+        """Return the listing status of every stored or rejected licensee, keyed by (profession, license_number)"""
+        statuses = {}
+        projection = {'_id': 0, 'profession': 1, 'license_number': 1, 'status': 1}
+        # Stored records come last so their status wins over an older rejection
+        for collection in (self.rejected, self.collection):
+            for doc in collection.find({'license_number': {'$nin': [None, '']}}, projection):
+                statuses[license_key(doc)] = doc.get('status') or None
+        return statuses
+
+    def mark_rejected(self, documents: List[Dict], reason: str) -> None:
+        """Remember licensees that were fetched but not stored, so later runs skip their detail pages"""
+        operations = [
+            UpdateOne(
+                self.license_filter(doc),
+                {'$set': {'status': doc.get('status') or None, 'reason': reason, 'checked_at': datetime.now()}},
+                upsert=True
+            )
+            for doc in documents if doc.get('license_number')
+        ]
+        if not operations:
+            return
+        try:
+            self.rejected.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logging.error(f"Error recording rejected licensees: {str(e)}")
+
+    def update_many(self, documents: List[Dict]) -> int:
+        """Overwrite the stored records with the same (profession, license_number) as `documents`.
+
+        Licensees only recorded as rejected so far are inserted.
+        """
+        operations = [
+            UpdateOne(
+                self.license_filter(doc),
+                {'$set': self.clean_document(doc)},
+                upsert=True
+            )
+            for doc in documents
+        ]
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+            return result.modified_count + result.upserted_count
+        except Exception as e:
+            logging.error(f"Error updating documents: {str(e)}")
+            return 0
     
     def insert_many(self, documents: List[Dict]):
         try:
             # Prepare documents with proper handling of empty values
-            processed_docs = []
-            for doc in documents:
-                # Clean empty strings to None for better MongoDB handling
-                cleaned_doc = {
-                    k: (None if v == '' else v) 
-                    for k, v in doc.items()
-                }
-                processed_docs.append(cleaned_doc)
+            processed_docs = [self.clean_document(doc) for doc in documents]
 
             # Use ordered=False to continue inserting even if some documents fail
             result = self.collection.insert_many(processed_docs, ordered=False)
@@ -49,6 +116,11 @@ class MongoDBHandler:
             if "duplicate key error" in str(e):
                 # Extract number of successful inserts from bulk write error
                 if hasattr(e, 'details'):
+                    duplicates = [
+                        documents[error['index']] for error in e.details.get('writeErrors', [])
+                        if error.get('code') == 11000
+                    ]
+                    self.mark_rejected(duplicates, 'duplicate_phone')
                     return e.details.get('nInserted', 0)
                 logging.warning("Duplicate records found and skipped")
                 return 0
@@ -58,9 +130,23 @@ class MongoDBHandler:
     def close(self):
         self.client.close()
 
-def create_session() -> requests.Session:
-    """Create a session with retry logic and proper headers"""
-    session = requests.Session()
+class RateLimitedSession(requests.Session):
+    """Session whose requests all take a slot from a shared rate limiter first"""
+    def __init__(self, limiter: Optional[BlockingRateLimiter] = None):
+        super().__init__()
+        self.limiter = limiter
+
+    def request(self, *args, **kwargs):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        return super().request(*args, **kwargs)
+
+def create_session(limiter: Optional[BlockingRateLimiter] = None) -> requests.Session:
+    """Create a session with retry logic and proper headers.
+
+    Sessions given the same `limiter` share one request-rate cap.
+    """
+    session = RateLimitedSession(limiter)
     
     # Set up retry strategy
     retry_strategy = Retry(
@@ -119,12 +205,12 @@ def get_page_results(soup: BeautifulSoup) -> List[Dict]:
         try:
             cells = row.find_all('td')
             if len(cells) < 5:
-                logging.warning(f"Row has insufficient cells: {len(cells)}")
+                record_log.event('short_rows', "Row has insufficient cells: %d", len(cells), level=logging.WARNING)
                 continue
                 
             profile_link = cells[0].find('a')
             if not profile_link or not profile_link.get('href'):
-                logging.warning("Missing profile link")
+                record_log.event('missing_links', "Missing profile link", level=logging.WARNING)
                 continue
                 
             results.append({
@@ -141,57 +227,145 @@ def get_page_results(soup: BeautifulSoup) -> List[Dict]:
             
     return results
 
+# Labels read from each profile page, in column order. Other labels on the page can be
+# added at no extra parsing cost, e.g. 'Fax', 'Year of Birth', 'School Name', 'Degree Date',
+# 'License Number' or 'Original License Date'.
+PROFILE_FIELDS = [
+    'Profession',
+    'Address',
+    'Phone',
+    'License Type',
+    'License Status',
+    'License Expiration Date',
+    'Last Renewal Date',
+]
+
+def sibling_text(node) -> Optional[str]:
+    """Return the stripped text right after `node`, or None if no text follows it"""
+    following = node.next_sibling if node is not None else None
+    return following.strip() if isinstance(following, NavigableString) else None
+
+def parse_profile_details(html: str, fields: Optional[List[str]] = None) -> Dict:
+    """Parse a profile page and extract its fields with `extract_profile_details`"""
+    return extract_profile_details(BeautifulSoup(html, 'html.parser'), fields)
+
+def extract_profile_details(soup: BeautifulSoup, fields: Optional[List[str]] = None) -> Dict:
+    """Extract the profile fields from a parsed profile page in a single pass over its labels.
+
+    Every `<strong>` label on the page is indexed once, and each field in `fields`
+    (default `PROFILE_FIELDS`) is looked up in that index. 'Address' is the text after
+    the line break that follows its label.
+    """
+    # Required fields
+    name = soup.find('h3')
+    if not name:
+        raise ValueError("Name field not found")
+
+    labels = {}
+    for strong in soup.find_all('strong'):
+        label = strong.string
+        if label is not None and label not in labels:
+            labels[label] = strong
+
+    details = {'Name': name.text.replace('Profile for ', '').strip()}
+    for field in fields or PROFILE_FIELDS:
+        element = labels.get(f"{field}:")
+        if field == 'Address':
+            # Special handling for address
+            details[field] = sibling_text(element.find_next('br')) if element else None
+            continue
+        if element is None:
+            record_log.event('missing_fields', "Field not found: %s:", field, level=logging.WARNING)
+        details[field] = sibling_text(element)
+    return details
+
 def get_profile_details(session: requests.Session, url: str) -> Optional[Dict]:
     """Extract detailed information from a profile page with enhanced error handling"""
     try:
         response = session.get(url)
         validate_response(response, "profile details")
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Helper function to safely extract text
-        def get_field_text(strong_text: str) -> Optional[str]:
-            element = soup.find('strong', text=strong_text)
-            if not element:
-                logging.warning(f"Field not found: {strong_text}")
-                return None
-            return element.next_sibling.strip() if element.next_sibling else None
-        
-        # Required fields
-        name = soup.find('h3')
-        if not name:
-            raise ValueError("Name field not found")
-        
-        details = {
-            'Name': name.text.replace('Profile for ', '').strip(),
-            'Profession': get_field_text('Profession:'),
-            'Address': None,
-            'Phone': get_field_text('Phone:'),
-          #  'Fax': get_field_text('Fax:'),
-          #  'Year of Birth': get_field_text('Year of Birth:'),
-          #  'School Name': get_field_text('School Name:'),
-          #  'Degree Date': get_field_text('Degree Date:'),
-           # 'License Number': get_field_text('License Number:'),
-            'License Type': get_field_text('License Type:'),
-            'License Status': get_field_text('License Status:'),
-            'License Expiration Date': get_field_text('License Expiration Date:'),
-          #  'Original License Date': get_field_text('Original License Date:'),
-            'Last Renewal Date': get_field_text('Last Renewal Date:')
-        }
-        
-        # Special handling for address
-        address_strong = soup.find('strong', text='Address:')
-        if address_strong and address_strong.find_next('br'):
-            details['Address'] = address_strong.find_next('br').next_sibling.strip()
-        
-        return details
+        return parse_profile_details(response.text)
         
     except Exception as e:
         logging.error(f"Error getting profile details for {url}: {str(e)}")
         return None
 
-def scrape_profession(session: requests.Session, profession_code: str, mongodb_handler: MongoDBHandler) -> int:
-    """Scrape all data for a single profession and store in MongoDB"""
+def has_phone(record: Dict) -> bool:
+    return bool(record.get('Phone') and record['Phone'].strip())
+
+def store_page_details(page_results: List[Dict], detail_futures: List[Future], profession_code: str,
+                       mongodb_handler: MongoDBHandler, refresh_results: Optional[List[Dict]] = None,
+                       refresh_futures: Optional[List[Future]] = None) -> int:
+    """Wait for the detail fetches of one results page and insert the page in one batch.
+
+    Known licensees whose status changed (`refresh_results`) are updated in place instead.
+    Fetched records without a phone number are recorded as rejected, so later runs skip
+    them too; records whose detail fetch failed are left to be fetched again.
+    """
+    if refresh_results:
+        refreshed = []
+        for result, future in zip(refresh_results, refresh_futures):
+            profile_details = future.result()
+            if profile_details:
+                result.update(profile_details)
+                refreshed.append(result)
+        valid_refreshed = [record for record in refreshed if has_phone(record)]
+        if valid_refreshed:
+            updated_count = mongodb_handler.update_many(valid_refreshed)
+            logging.info(f"Updated {updated_count} records with a changed status for profession {profession_code}")
+        if len(valid_refreshed) < len(refreshed):
+            mongodb_handler.mark_rejected([record for record in refreshed if not has_phone(record)], 'no_phone')
+
+    batch = []
+    for result, future in zip(page_results, detail_futures):
+        profile_details = future.result()
+        if profile_details:
+            result.update(profile_details)
+            batch.append(result)
+
+    # Filter out profiles without phone numbers and insert into MongoDB
+    inserted_count = 0
+    valid_batch = [record for record in batch if has_phone(record)]
+    if valid_batch:
+        inserted_count = mongodb_handler.insert_many(valid_batch)
+        logging.info(f"Inserted {inserted_count} records with phone numbers for profession {profession_code}")
+    skipped_count = len(batch) - len(valid_batch)
+    if skipped_count > 0:
+        mongodb_handler.mark_rejected([record for record in batch if not has_phone(record)], 'no_phone')
+        logging.info(f"Skipped {skipped_count} records without phone numbers")
+    return inserted_count
+
+def split_known_results(page_results: List[Dict], known_licenses: Optional[Dict[Tuple[str, str], str]],
+                        refresh_changed_status: bool) -> Tuple[List[Dict], List[Dict]]:
+    """Split listing rows into new licensees and known ones to refresh; other known rows are dropped"""
+    if known_licenses is None:
+        return page_results, []
+
+    new_results = []
+    refresh_results = []
+    for result in page_results:
+        key = license_key(result)
+        if key not in known_licenses:
+            new_results.append(result)
+        elif refresh_changed_status and known_licenses[key] != (result['status'] or None):
+            refresh_results.append(result)
+        else:
+            record_log.event('skipped_known', "Skipping known license %s (%s)", result['license_number'], result['profession'])
+    return new_results, refresh_results
+
+def scrape_profession(session: requests.Session, profession_code: str, mongodb_handler: MongoDBHandler,
+                      detail_workers: int = 4, known_licenses: Optional[Dict[Tuple[str, str], str]] = None,
+                      refresh_changed_status: bool = False) -> int:
+    """Scrape all data for a single profession and store in MongoDB.
+
+    Only the `navigate=next` paging has to stay serial on the session. The detail pages
+    of each results page are fetched by a pool of `detail_workers` threads while the
+    listing moves on to the next page, and each page is inserted once its details are in.
+
+    Rows whose (profession, license_number) is in `known_licenses` are skipped without
+    fetching their detail page. With `refresh_changed_status`, known rows whose listing
+    status differs from the stored one are fetched again and updated.
+    """
     url = "https://www.kansas.gov/ssrv-ksbhada/search.html"
     data = {'profession': profession_code}
     records_processed = 0
@@ -203,47 +377,53 @@ def scrape_profession(session: requests.Session, profession_code: str, mongodb_h
         soup = BeautifulSoup(response.text, 'html.parser')
         page_number = 1
         
-        while True:
-            logging.info(f"Processing profession {profession_code} - page {page_number}")
-            
-            page_results = get_page_results(soup)
-            if not page_results:
-                break
-            
-            batch = []
-            for result in page_results:
-                profile_details = get_profile_details(session, result['profile_link'])
-                if profile_details:
-                    result.update(profile_details)
-                    batch.append(result)
-                
-                #  delay between profile requests
-                time.sleep(random.uniform(.5, 1.5)) 
-            
-            # Filter out profiles without phone numbers and insert into MongoDB
-            valid_batch = [record for record in batch if record.get('Phone') and record['Phone'].strip()]
-            if valid_batch:
-                inserted_count = mongodb_handler.insert_many(valid_batch)
-                records_processed += inserted_count
-                logging.info(f"Inserted {inserted_count} records with phone numbers for profession {profession_code}")
-            skipped_count = len(batch) - len(valid_batch)
-            if skipped_count > 0:
-                logging.info(f"Skipped {skipped_count} records without phone numbers")
-            
-            # Handle pagination
-            pagination = soup.find('div', class_='pagination')
-            next_link = pagination.find('a', text='Next') if pagination else None
-            
-            if not next_link:
-                break
-            
-            response = session.get("https://www.kansas.gov/ssrv-ksbhada/results.html?navigate=next")
-            validate_response(response, "pagination")
-            soup = BeautifulSoup(response.text, 'html.parser')
-            page_number += 1
-            
-            # Consistent delay between pages
-            time.sleep(random.uniform(1.5, 3.5))
+        with ThreadPoolExecutor(max_workers=detail_workers, thread_name_prefix=f'details-{profession_code}') as detail_pool:
+            # Results page whose details are still loading: (page_results, detail_futures)
+            pending_page = None
+            try:
+                while True:
+                    logging.info(f"Processing profession {profession_code} - page {page_number}")
+
+                    page_results = get_page_results(soup)
+                    if not page_results:
+                        break
+
+                    new_results, refresh_results = split_known_results(
+                        page_results, known_licenses, refresh_changed_status
+                    )
+                    detail_futures = [
+                        detail_pool.submit(get_profile_details, session, result['profile_link'])
+                        for result in new_results
+                    ]
+                    refresh_futures = [
+                        detail_pool.submit(get_profile_details, session, result['profile_link'])
+                        for result in refresh_results
+                    ]
+
+                    # Store the previous page while this page's details load
+                    if pending_page is not None:
+                        records_processed += store_page_details(*pending_page)
+                    pending_page = (
+                        new_results, detail_futures, profession_code, mongodb_handler, refresh_results, refresh_futures
+                    )
+
+                    # Handle pagination
+                    pagination = soup.find('div', class_='pagination')
+                    next_link = pagination.find('a', text='Next') if pagination else None
+
+                    if not next_link:
+                        break
+
+                    response = session.get("https://www.kansas.gov/ssrv-ksbhada/results.html?navigate=next")
+                    validate_response(response, "pagination")
+                    soup = BeautifulSoup(response.text, 'html.parser')
+                    page_number += 1
+
+                    # Consistent delay between pages
+                    time.sleep(random.uniform(1.5, 3.5))
+            finally:
+                if pending_page is not None:
+                    records_processed += store_page_details(*pending_page)
             
     except RequestError as e:
         logging.error(f"Request error for profession {profession_code}: {str(e)}")
@@ -252,11 +432,70 @@ def scrape_profession(session: requests.Session, profession_code: str, mongodb_h
     
     return records_processed
 
+def scrape_professions_parallel(profession_codes: List[str], mongodb_handler: MongoDBHandler,
+                                max_workers: int, requests_per_second: float, detail_workers: int = 4,
+                                known_licenses: Optional[Dict[Tuple[str, str], str]] = None,
+                                refresh_changed_status: bool = False) -> Dict[str, int]:
+    """Scrape professions concurrently on a bounded thread pool.
+
+    Search results are paged with server-side state (`results.html?navigate=next`), so
+    each profession gets its own session. All sessions share one request-rate cap.
+
+    Returns:
+        Dict[str, int]: Records inserted per profession code.
+    """
+    limiter = BlockingRateLimiter(requests_per_second, 1, name='kansas')
+    counts = {}
+
+    def run(profession_code: str) -> int:
+        session = create_session(limiter)
+        try:
+            return scrape_profession(
+                session, profession_code, mongodb_handler, detail_workers, known_licenses, refresh_changed_status
+            )
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='profession') as executor:
+        futures = {executor.submit(run, code): code for code in profession_codes}
+        for future in as_completed(futures):
+            profession_code = futures[future]
+            try:
+                counts[profession_code] = future.result()
+            except Exception as e:
+                logging.error(f"Failed to process profession {profession_code}: {str(e)}")
+                counts[profession_code] = 0
+                continue
+            logging.info(f"Completed profession {profession_code} - {counts[profession_code]} records processed")
+            print(f"Completed profession {profession_code} - {counts[profession_code]} records processed")
+
+    return counts
+
 def main():
+    # Set up logging; records are written by a background thread
+    setup_logging(f'scraper_log_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log', console=False)
+
     # MongoDB configuration
     MONGO_CONNECTION_STRING = "mongodb://localhost:27017/"
     DATABASE_NAME = "professional_lead"
     COLLECTION_NAME = "kansas_board_of_healing_arts"
+
+    # Replace per-record log lines with a summary every 30 seconds
+    BULK_LOGGING = False
+    record_log.configure(bulk=BULK_LOGGING, interval=30)
+
+    # Professions scraped at the same time, each on its own session (1 = one after another),
+    # and the request-rate cap shared by all of them
+    PARALLEL_PROFESSIONS = 4
+    MAX_REQUESTS_PER_SECOND = 3
+
+    # Profile detail pages fetched at the same time for each profession
+    DETAIL_WORKERS = 4
+
+    # Skip licensees already stored or rejected (no phone, duplicate phone), unless their
+    # listing status changed and refreshing is on
+    SKIP_KNOWN_LICENSES = True
+    REFRESH_CHANGED_STATUS = False
     
     # List of profession codes to scrape
     profession_codes = [
@@ -268,26 +507,48 @@ def main():
     ]
     
     total_records = 0
+    profession_counts = {}
     
     try:
         mongodb_handler = MongoDBHandler(MONGO_CONNECTION_STRING, DATABASE_NAME, COLLECTION_NAME)
-        session = create_session()
+
+        known_licenses = None
+        if SKIP_KNOWN_LICENSES:
+            known_licenses = mongodb_handler.load_license_statuses()
+            logging.info(f"Loaded {len(known_licenses)} known licenses")
+
+        if PARALLEL_PROFESSIONS > 1:
+            profession_counts = scrape_professions_parallel(
+                profession_codes, mongodb_handler, PARALLEL_PROFESSIONS, MAX_REQUESTS_PER_SECOND, DETAIL_WORKERS,
+                known_licenses, REFRESH_CHANGED_STATUS
+            )
+            total_records = sum(profession_counts.values())
+        else:
+            # Detail pages are fetched in parallel, so the rate cap applies here as well
+            session = create_session(BlockingRateLimiter(MAX_REQUESTS_PER_SECOND, 1, name='kansas'))
+
+            for profession_code in profession_codes:
+                try:
+                    records = scrape_profession(
+                        session, profession_code, mongodb_handler, DETAIL_WORKERS, known_licenses, REFRESH_CHANGED_STATUS
+                    )
+                    total_records += records
+                    profession_counts[profession_code] = records
+
+                    logging.info(f"Completed profession {profession_code} - {records} records processed")
+                    print(f"Completed profession {profession_code} - {records} records processed")
+
+                    # Consistent delay between professions
+                    time.sleep(random.uniform(3, 4))
+
+                except Exception as e:
+                    logging.error(f"Failed to process profession {profession_code}: {str(e)}")
+                    continue
         
+        record_log.flush()
         for profession_code in profession_codes:
-            try:
-                records = scrape_profession(session, profession_code, mongodb_handler)
-                total_records += records
-                
-                logging.info(f"Completed profession {profession_code} - {records} records processed")
-                print(f"Completed profession {profession_code} - {records} records processed")
-                
-                # Consistent delay between professions
-                time.sleep(random.uniform(3, 4))
-                
-            except Exception as e:
-                logging.error(f"Failed to process profession {profession_code}: {str(e)}")
-                continue
-        
+            if profession_code in profession_counts:
+                logging.info(f"Profession {profession_code}: {profession_counts[profession_code]} records")
         logging.info(f"Scraping completed. Total records collected: {total_records}")
         print(f"Scraping completed. Total records collected: {total_records}")
         
@@ -0,0 +1,103 @@
+import argparse
+import glob
+import logging
+import os
+import timeit
+from typing import Dict, Optional
+
+from bs4 import BeautifulSoup
+
+from kansas import create_session, extract_profile_details, parse_profile_details
+
+SAVED_PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_profiles')
+
+def legacy_profile_details(html: str) -> Optional[Dict]:
+    """The parsing `get_profile_details` did before the label index"""
+    return legacy_extract_details(BeautifulSoup(html, 'html.parser'))
+
+def legacy_extract_details(soup: BeautifulSoup) -> Optional[Dict]:
+    """The extraction `get_profile_details` did before the label index: one tree scan per field"""
+    try:
+        def get_field_text(strong_text: str) -> Optional[str]:
+            element = soup.find('strong', string=strong_text)
+            if not element:
+                return None
+            return element.next_sibling.strip() if element.next_sibling else None
+
+        name = soup.find('h3')
+        if not name:
+            raise ValueError("Name field not found")
+
+        details = {
+            'Name': name.text.replace('Profile for ', '').strip(),
+            'Profession': get_field_text('Profession:'),
+            'Address': None,
+            'Phone': get_field_text('Phone:'),
+            'License Type': get_field_text('License Type:'),
+            'License Status': get_field_text('License Status:'),
+            'License Expiration Date': get_field_text('License Expiration Date:'),
+            'Last Renewal Date': get_field_text('Last Renewal Date:')
+        }
+
+        address_strong = soup.find('strong', string='Address:')
+        if address_strong and address_strong.find_next('br'):
+            details['Address'] = address_strong.find_next('br').next_sibling.strip()
+
+        return details
+    except Exception:
+        return None
+
+def save_profile_pages(urls, directory: str):
+    """Download profile pages into `directory` for later benchmark runs"""
+    os.makedirs(directory, exist_ok=True)
+    session = create_session()
+    for index, url in enumerate(urls, start=1):
+        response = session.get(url)
+        response.raise_for_status()
+        with open(os.path.join(directory, f'profile_{index}.html'), 'w', encoding='utf-8') as file:
+            file.write(response.text)
+    print(f"Saved {len(urls)} profile pages to {directory}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the label-index profile parser with the per-field scans it replaced.")
+    parser.add_argument('--pages', default=SAVED_PROFILES_DIR, help="Directory of saved profile pages (*.html).")
+    parser.add_argument('--save', nargs='+', metavar='URL', help="Download these profile pages into --pages first.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions; the best one is reported.")
+    args = parser.parse_args()
+
+    # Pages without some fields log warnings; keep them out of the benchmark output
+    logging.getLogger().addHandler(logging.NullHandler())
+
+    if args.save:
+        save_profile_pages(args.save, args.pages)
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.pages, '*.html'))):
+        with open(path, encoding='utf-8') as file:
+            pages.append(file.read())
+    if not pages:
+        parser.error(f"No saved profile pages in {args.pages}. Save some with --save URL [URL ...].")
+
+    for page in pages:
+        legacy = legacy_profile_details(page)
+        if legacy is not None:
+            assert parse_profile_details(page) == legacy, legacy
+
+    legacy_time = min(timeit.repeat(lambda: [legacy_profile_details(page) for page in pages], number=1, repeat=args.repeat))
+    index_time = min(timeit.repeat(lambda: [parse_profile_details(page) for page in pages], number=1, repeat=args.repeat))
+    print(
+        f"{len(pages)} pages, identical output. Parse and extract: per-field scans {legacy_time * 1000:.1f} ms, "
+        f"label index {index_time * 1000:.1f} ms ({legacy_time / index_time:.2f}x)"
+    )
+
+    # The same comparison without the HTML parsing, which both versions share
+    soups = [BeautifulSoup(page, 'html.parser') for page in pages]
+    legacy_time = min(timeit.repeat(lambda: [legacy_extract_details(soup) for soup in soups], number=1, repeat=args.repeat))
+    index_time = min(timeit.repeat(lambda: [extract_profile_details(soup) for soup in soups], number=1, repeat=args.repeat))
+    print(
+        f"Extract only: per-field scans {legacy_time * 1000:.1f} ms, "
+        f"label index {index_time * 1000:.1f} ms ({legacy_time / index_time:.2f}x)"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import copy
+import random
+import string
+import timeit
+
+from profile_normalizer import get_profile_normalizer
+
+
+def remove_empty_fields(d):
+    """
+    Recursively removes fields with empty or default values from a dictionary or list.
+
+    - Removes 'Address' if it's a dictionary with all empty values.
+    - For dictionaries, removes keys with None, empty strings, empty lists, or empty dictionaries.
+    - For lists, removes items that are None, empty strings, empty lists, or empty dictionaries.
+
+    Returns:
+    dict or list: The cleaned data structure.
+    """
+
+    if isinstance(d, dict):
+        if 'Address' in d:
+            address = d['Address']
+            if isinstance(address, dict) and not any(address.values()):
+                d.pop('Address')
+        
+        return {k: remove_empty_fields(v) for k, v in d.items() if v not in [None, "", [], {}]}
+    elif isinstance(d, list):
+        return [remove_empty_fields(v) for v in d if v not in [None, "", [], {}]]
+    else:
+        return d
+
+
+def legacy_normalize(profile, details, include_address=False):
+    """The record building and cleaning `process_profiles` did before the compiled normalizer."""
+    address = profile.get('Address', {})
+    if address is None:
+        address = {}
+
+    phone = profile.get('Phone')
+    if phone is None:
+        phone = {}
+
+    processed_profile = {
+        "FullName": profile.get('FullName', ""),
+        "Address": {
+            "Name": address.get('Name', ""),
+            "Line1": address.get('Line1', ""),
+            "Line2": address.get('Line2', ""),
+            "Line3": address.get('Line3', ""),
+            "City": address.get('City', ""),
+            "State": address.get('State', ""),
+            "ZipCode": address.get('ZipCode', ""),
+        },
+        "Locations": profile.get('Locations', []),
+        "Phone": {
+            "AreaCode": phone.get('AreaCode', ""),
+            "Number": phone.get('Number', ""),
+            "Extension": phone.get('Extension', ""),
+        },
+        "Email": profile.get('Email', ""),
+        "Website": profile.get('Website', ""),
+        "Insurance/Payment": details['Insurance/Payment'] or [],
+        "Specialties": details['Specialties'] or [],
+    }
+
+    if include_address:
+        processed_profile["Address"] = details['Address'] or []
+
+    return remove_empty_fields(processed_profile)
+
+
+def maybe(rng, value, empty_rate=0.3, empties=(None, "", [], {})):
+    """Return `value` or, with probability `empty_rate`, one of the empty values the API sends."""
+    if rng.random() < empty_rate:
+        return copy.copy(rng.choice(empties))
+    return value
+
+
+def random_word(rng, length=8):
+    return ''.join(rng.choices(string.ascii_letters, k=length))
+
+
+def random_address(rng):
+    return {
+        key: maybe(rng, random_word(rng), 0.5)
+        for key in ('Name', 'Line1', 'Line2', 'Line3', 'City', 'State', 'ZipCode')
+        if rng.random() < 0.9
+    }
+
+
+def make_profile(rng):
+    """Build one synthetic API profile with its detail page fields."""
+    profile = {
+        'FullName': maybe(rng, random_word(rng, 12)),
+        'Email': f"{random_word(rng)}@example.com",
+        'Website': maybe(rng, f"https://{random_word(rng)}.com", 0.6),
+        'Locations': maybe(rng, [
+            {
+                'Address': maybe(rng, random_address(rng), 0.2),
+                'Phone': maybe(rng, {'Number': random_word(rng, 7), 'Extension': maybe(rng, "12", 0.8)}),
+                'Distance': rng.choice([0, 1.5, None]),
+                'Tags': [maybe(rng, random_word(rng), 0.4) for _ in range(rng.randint(0, 3))],
+            }
+            for _ in range(rng.randint(0, 3))
+        ], 0.2),
+    }
+    if rng.random() < 0.9:
+        profile['Address'] = maybe(rng, random_address(rng), 0.1, (None, {}))
+    if rng.random() < 0.9:
+        profile['Phone'] = maybe(rng, {'AreaCode': maybe(rng, "555"), 'Number': maybe(rng, "1234567")}, 0.1, (None, {}))
+
+    details = {
+        'Insurance/Payment': maybe(rng, [maybe(rng, random_word(rng), 0.1) for _ in range(rng.randint(0, 4))], 0.2),
+        'Specialties': maybe(rng, [random_word(rng) for _ in range(rng.randint(0, 6))], 0.2),
+        'Address': maybe(rng, [maybe(rng, random_word(rng), 0.2) for _ in range(rng.randint(0, 4))], 0.2),
+    }
+    return profile, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compiled profile normalizer with remove_empty_fields.")
+    parser.add_argument('--profiles', type=int, default=50000, help="Number of synthetic profiles.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions; the best one is reported.")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    batch = [make_profile(rng) for _ in range(args.profiles)]
+
+    for include_address in (False, True):
+        normalize = get_profile_normalizer(include_address)
+        # remove_empty_fields pops empty nested addresses in place, so the legacy path gets its own copy
+        legacy_batch = copy.deepcopy(batch)
+        for (profile, details), (legacy_profile, legacy_details) in zip(batch, legacy_batch):
+            expected = legacy_normalize(legacy_profile, legacy_details, include_address)
+            actual = normalize(profile, details)
+            assert actual == expected and list(actual) == list(expected), (profile, details, expected, actual)
+
+        legacy_time = min(timeit.repeat(
+            lambda: [legacy_normalize(p, d, include_address) for p, d in legacy_batch], number=1, repeat=args.repeat
+        ))
+        compiled_time = min(timeit.repeat(
+            lambda: [normalize(p, d) for p, d in batch], number=1, repeat=args.repeat
+        ))
+        print(
+            f"include_address={include_address}: {args.profiles} profiles, identical output; "
+            f"remove_empty_fields {legacy_time * 1000:.0f} ms, compiled normalizer {compiled_time * 1000:.0f} ms "
+            f"({legacy_time / compiled_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,70 @@
+import argparse
 import json
+import hashlib
+import os
 import logging
 import random
 import asyncio
+import itertools
+import math
 import socket
-
-from aiohttp import ClientSession, ClientError, ClientTimeout
-from aiolimiter import AsyncLimiter 
+import time
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from aiohttp import ClientSession, ClientError, ClientResponseError, ClientTimeout
 from bs4 import BeautifulSoup
 import pymongo
-from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
 
-from zip_state_list import states, cities
+from profile_normalizer import get_profile_normalizer
+from rate_limiter import AdaptiveRateLimiter, THROTTLE_STATUSES
+from scraper_logging import RecordLogger, setup_logging
+from zip_state_list import states, plan_coverage, plan_zip_codes
 
-# Initialize the rate limiter: 10 requests per 60 seconds 
-limiter = AsyncLimiter(10, 60)
+# Adaptive rate limiters, starting at 10 requests per 60 seconds; see configure_rate_limits()
+api_limiter = AdaptiveRateLimiter(10, 60, name='api')
+profile_limiter = api_limiter
+enrichment_limiter = profile_limiter
 
 log_file = 'script.log'
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler(log_file),
-                        logging.StreamHandler()
-                    ])
+
+# Sampled logging for per-profile messages; configured from the `logging` config section
+record_log = RecordLogger()
+
+
+def configure_rate_limits(rate_limits):
+    """Create the API and profile page limiters from the `rate_limits` config section.
+
+    Each entry holds `AdaptiveRateLimiter` settings (rate, per, min_rate, max_rate, ...).
+    Without a 'profile' entry, profile pages share the API budget. Without an
+    'enrichment' entry, the lazy enrichment pass shares the profile page budget.
+    """
+    global api_limiter, profile_limiter, enrichment_limiter
+    api_limiter = AdaptiveRateLimiter.from_config(rate_limits.get('api', {}), name='api')
+    if 'profile' in rate_limits:
+        profile_limiter = AdaptiveRateLimiter.from_config(rate_limits['profile'], name='profile')
+    else:
+        profile_limiter = api_limiter
+    if 'enrichment' in rate_limits:
+        enrichment_limiter = AdaptiveRateLimiter.from_config(rate_limits['enrichment'], name='enrichment')
+    else:
+        enrichment_limiter = profile_limiter
 
 
 def load_config(file_path='config.json'):
@@ -37,34 +80,88 @@ def load_config(file_path='config.json'):
         raise
 
 
-async def fetch_profiles_page(session, api_url, params):
-    """Fetch a single page of profiles from the API.
+# Keys under which the API may report the total number of matching profiles
+TOTAL_COUNT_KEYS = ('TotalCount', 'TotalResults', 'TotalItems', 'Total')
+
+
+def extract_total_count(data):
+    """Return the total result count from an API payload, or None if it is not reported."""
+    for key in TOTAL_COUNT_KEYS:
+        value = data.get(key)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    return None
+
+
+async def fetch_profiles_result(session, api_url, params, max_retries=3, base_delay=2.5):
+    """Fetch a single page of profiles from the API together with the total result count.
 
     Args:
         session (ClientSession): The aiohttp session to use for the request.
         api_url (str): The URL of the API endpoint.
         params (dict): The query parameters for the API request.
+        max_retries (int): Maximum number of retry attempts on timeout or 429/503. Defaults to 3.
+        base_delay (int or float): Base delay in seconds for exponential backoff. Defaults to 2.5.
 
     Returns:
-        list: A list of profile data dictionaries.
+        tuple: (list of profile data dictionaries, total count or None if not reported).
+            The list is None if the request failed, so an error is not mistaken for an empty page.
     """
-    try:
-        async with limiter: 
-            async with session.get(api_url, params=params, timeout=ClientTimeout(total=50)) as response:
-                response.raise_for_status()
-                data = await response.json()
+    attempts = 0
+    while attempts < max_retries:
+        try:
+            async with api_limiter:
+                started = time.monotonic()
+                async with session.get(api_url, params=params, timeout=ClientTimeout(total=50)) as response:
+                    api_limiter.record(response.status, time.monotonic() - started, response.headers.get('Retry-After'))
+                    response.raise_for_status()
+                    data = await response.json()
 
-                if isinstance(data.get('data'), str) and "Unable to locate" in data.get('data'):
-                    logging.warning(f"No data found for parameters {params}. Skipping.")
-                    return []
-                return data.get('data', {}).get('Items', [])
+                    if isinstance(data.get('data'), str) and "Unable to locate" in data.get('data'):
+                        logging.warning(f"No data found for parameters {params}. Skipping.")
+                        return [], None
+                    payload = data.get('data', {})
+                    return payload.get('Items', []), extract_total_count(payload)
+
+        except asyncio.TimeoutError:
+            attempts += 1
+            api_limiter.record(None)
+            logging.error(f"Timeout fetching data for parameters {params}. Retrying...")
+        except ClientResponseError as error:
+            if error.status not in THROTTLE_STATUSES:
+                logging.error(f"Error fetching data: {error}")
+                break
+            attempts += 1
+            logging.warning(f"Throttled with status {error.status} by the API for parameters {params}. Retrying...")
+        except ClientError as error:
+            logging.error(f"Error fetching data: {error}")
+            break
+        except Exception as error:
+            logging.error(f"Unexpected error: {error}")
+            break
 
-    except (asyncio.TimeoutError, ClientError) as error:
-        logging.error(f"Error fetching data: {error}")
-        return []
-    except Exception as error:
-        logging.error(f"Unexpected error: {error}")
-        return []
+        # The limiter also holds further requests for any Retry-After pause it was given
+        delay = base_delay * (2 ** attempts) + random.uniform(0, 1)
+        await asyncio.sleep(delay)
+
+    return None, None
+
+
+async def fetch_profiles_page(session, api_url, params):
+    """Fetch a single page of profiles from the API.
+
+    Args:
+        session (ClientSession): The aiohttp session to use for the request.
+        api_url (str): The URL of the API endpoint.
+        params (dict): The query parameters for the API request.
+
+    Returns:
+        list: A list of profile data dictionaries, or None if the request failed.
+    """
+    profiles, _ = await fetch_profiles_result(session, api_url, params)
+    return profiles
 
 
 async def extract_insurance_payment_and_specialties(
@@ -72,7 +169,8 @@ async def extract_insurance_payment_and_specialties(
     url, 
     include_address=False, 
     max_retries=3, 
-    base_delay=2.5
+    base_delay=2.5,
+    limiter=None
 ):
     """
     Extract insurance/payment, specialties, and address information from a webpage.
@@ -81,36 +179,40 @@ async def extract_insurance_payment_and_specialties(
         session (aiohttp.ClientSession): The aiohttp session for making HTTP requests.
         url (str): The webpage URL to extract information from.
         include_address (bool): Whether to extract address information. Defaults to False.
-        max_retries (int): Maximum number of retry attempts on timeout. Defaults to 3.
+        max_retries (int): Maximum number of retry attempts on timeout or 429/503. Defaults to 3.
         base_delay (int or float): Base delay in seconds for exponential backoff. Defaults to 1.
+        limiter (AdaptiveRateLimiter, optional): The rate limiter to use. Defaults to `profile_limiter`.
 
     Returns:
         dict: A dictionary containing:
             - 'Insurance/Payment': List of extracted insurance/payment options.
             - 'Specialties': List of extracted specialties.
             - 'Address': List of extracted address components (if `include_address` is True).
-            Returns None if max retries are exceeded.
+            Returns None if the page could not be fetched, so a failure is not stored as a
+            profile without details.
     """
+    limiter = limiter or profile_limiter
     attempts = 0
     while attempts < max_retries:
         try:
             async with limiter:
+                started = time.monotonic()
                 async with session.get(url, timeout=ClientTimeout(total=50)) as response:
+                    limiter.record(response.status, time.monotonic() - started, response.headers.get('Retry-After'))
                     response.raise_for_status()
-                    soup = BeautifulSoup(await response.text(), 'html.parser')
-
-                    insurance_payment = extract_insurance_payment(soup)
-                    specialties = extract_specialties(soup)
-                    address = extract_address(soup) if include_address else []
-
-                    return {
-                        'Insurance/Payment': insurance_payment,
-                        'Specialties': specialties,
-                        'Address': address
-                    }
+                    body = await response.read()
+                    encoding = response.get_encoding()
+            return await parse_profile_body(body, encoding, include_address=include_address)
         except asyncio.TimeoutError:
             attempts += 1
+            limiter.record(None)
             logging.error(f"Timeout error when connecting to {url}. Retrying...")
+        except ClientResponseError as error:
+            if error.status not in THROTTLE_STATUSES:
+                logging.error(f"Client error: {error}")
+                break
+            attempts += 1
+            logging.warning(f"Throttled with status {error.status} by {url}. Retrying...")
         except socket.gaierror:
             logging.error(f"DNS resolution failed for {url}. Retrying...")
             break  # Exit retry loop for DNS errors
@@ -124,46 +226,355 @@ async def extract_insurance_payment_and_specialties(
         delay = base_delay * (2 ** attempts) + random.uniform(0, 1)
         await asyncio.sleep(delay)
 
-    return {'Insurance/Payment': [], 'Specialties': [], 'Address': []}
+    return None
+
+
+# Detail page fields of a profile, empty; lazily stored records start out with these
+EMPTY_DETAILS = {'Insurance/Payment': [], 'Specialties': [], 'Address': []}
+
+EXPERIENCE_SECTION_CLASS = 'nutritionist-details__experience'
+EXPERIENCE_ITEM_CLASS = 'nutritionist-details__experience-item'
+
+
+class SoupBackend:
+    """BeautifulSoup with the pure-Python `html.parser`; always available."""
+    name = 'html.parser'
+
+    @staticmethod
+    def parse(html):
+        return BeautifulSoup(html, 'html.parser')
+
+    @staticmethod
+    def find_first(node, tag, class_name=None):
+        return node.find(tag, class_=class_name) if class_name else node.find(tag)
 
+    @staticmethod
+    def descendants(node):
+        return node.find_all(True)
 
-def extract_address(soup):
-    """Extract address information from BeautifulSoup object as a list."""
+    @staticmethod
+    def tag(node):
+        return node.name
+
+    @staticmethod
+    def classes(node):
+        return node.get('class') or []
+
+    @staticmethod
+    def strings(node):
+        return list(node.strings)
+
+    @staticmethod
+    def single_string(node):
+        return node.string
+
+    @staticmethod
+    def next_siblings(node):
+        return node.find_next_siblings()
+
+
+class LxmlBackend:
+    """lxml's libxml2 HTML parser."""
+    name = 'lxml'
+
+    @staticmethod
+    def parse(html):
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that still carries an XML encoding declaration
+            return lxml.html.document_fromstring(html.encode('utf-8'))
+
+    @staticmethod
+    def find_first(node, tag, class_name=None):
+        if class_name:
+            matches = node.xpath(f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]")
+        else:
+            matches = node.xpath(f".//{tag}")
+        return matches[0] if matches else None
+
+    @staticmethod
+    def descendants(node):
+        return (element for element in node.iterdescendants() if isinstance(element.tag, str))
+
+    @staticmethod
+    def tag(node):
+        return node.tag
+
+    @staticmethod
+    def classes(node):
+        return (node.get('class') or '').split()
+
+    @staticmethod
+    def strings(node):
+        return [str(text) for text in node.xpath('.//text()')]
+
+    @staticmethod
+    def single_string(node):
+        # Same rule as BeautifulSoup's `.string`: only a node with exactly one child has one.
+        while True:
+            children = len(node) + sum(1 for child in node if child.tail) + (1 if node.text else 0)
+            if children != 1:
+                return None
+            if node.text:
+                return node.text
+            node = node[0]
+            if not isinstance(node.tag, str):
+                return node.text
+
+    @staticmethod
+    def next_siblings(node):
+        return [element for element in node.itersiblings() if isinstance(element.tag, str)]
+
+
+class SelectolaxBackend:
+    """selectolax's Lexbor HTML5 parser."""
+    name = 'selectolax'
+
+    @staticmethod
+    def parse(html):
+        return LexborHTMLParser(html)
+
+    @staticmethod
+    def find_first(node, tag, class_name=None):
+        return node.css_first(f"{tag}.{class_name}" if class_name else tag)
+
+    @staticmethod
+    def descendants(node):
+        iterator = node.traverse()
+        next(iterator, None)
+        return (element for element in iterator if element.is_element_node)
+
+    @staticmethod
+    def tag(node):
+        return node.tag
+
+    @staticmethod
+    def classes(node):
+        return (node.attributes.get('class') or '').split()
+
+    @staticmethod
+    def strings(node):
+        return [child.text_content for child in node.traverse(include_text=True) if child.is_text_node]
+
+    @staticmethod
+    def single_string(node):
+        # Same rule as BeautifulSoup's `.string`: only a node with exactly one child has one.
+        while True:
+            children = list(node.iter(include_text=True))
+            if len(children) != 1:
+                return None
+            node = children[0]
+            if node.is_text_node:
+                return node.text_content
+            if node.is_comment_node:
+                return node.comment_content
+
+    @staticmethod
+    def next_siblings(node):
+        siblings = []
+        node = node.next
+        while node is not None:
+            if node.is_element_node:
+                siblings.append(node)
+            node = node.next
+        return siblings
+
+
+HTML_BACKENDS = {
+    'selectolax': SelectolaxBackend if LexborHTMLParser else None,
+    'lxml': LxmlBackend if lxml else None,
+    'html.parser': SoupBackend,
+}
+
+
+def get_html_backend(name='html.parser'):
+    """Return the HTML parser backend called `name`.
+
+    selectolax and lxml are only used when asked for by name: on malformed markup they
+    can build a different tree than `html.parser`, so their output is not guaranteed to
+    match (check saved pages with `parser_parity.py`). An unknown or uninstalled backend
+    falls back to BeautifulSoup's `html.parser`.
+    """
+    backend = HTML_BACKENDS.get(name)
+    if backend is None:
+        logging.warning(f"HTML parser backend '{name}' is not available. Falling back to html.parser.")
+        return SoupBackend
+    return backend
+
+
+html_backend = get_html_backend()
+
+
+def configure_html_backend(name='html.parser'):
+    """Select the parser backend used by `extract_profile_details`."""
+    global html_backend
+    html_backend = get_html_backend(name)
+    logging.info(f"Parsing profile pages with {html_backend.name}.")
+
+
+# Optional process pool for parsing profile pages off the event loop; see configure_parse_pool()
+parse_executor = None
+
+
+def configure_parse_pool(workers=0):
+    """Parse profile pages in a pool of `workers` processes, or on the event loop if 0."""
+    global parse_executor
+    if parse_executor is not None:
+        parse_executor.shutdown(wait=True)
+        parse_executor = None
+    if workers > 0:
+        parse_executor = ProcessPoolExecutor(max_workers=workers)
+        logging.info(f"Parsing profile pages in {workers} worker processes.")
+
+
+def parse_profile_page(body, encoding, include_address=False, backend_name='html.parser'):
+    """Decode and parse a raw profile page into a plain dict; runs in the parse pool."""
+    html = body.decode(encoding or 'utf-8', errors='replace')
+    return extract_profile_details(html, include_address=include_address, backend=get_html_backend(backend_name))
+
+
+async def parse_profile_body(body, encoding, include_address=False):
+    """Parse a raw profile page, in the parse pool when one is configured."""
+    if parse_executor is None:
+        return parse_profile_page(body, encoding, include_address=include_address, backend_name=html_backend.name)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(parse_executor, parse_profile_page, body, encoding, include_address, html_backend.name)
+
+
+class LoopLagMonitor:
+    """Measures event loop lag: how late a periodic timer wakes up.
+
+    High lag means CPU-bound work (such as HTML parsing) is blocking timers and sockets.
+    """
+
+    def __init__(self, interval=0.1, max_samples=10000):
+        self.interval = interval
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples.append(lag)
+            self.count += 1
+            self.total += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def summary(self):
+        """Return average, 95th percentile and maximum lag in milliseconds."""
+        if not self.count:
+            return {'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(self.samples)
+        return {
+            'avg_ms': 1000 * self.total / self.count,
+            'p95_ms': 1000 * ordered[int(0.95 * (len(ordered) - 1))],
+            'max_ms': 1000 * self.max_lag,
+        }
+
+
+def extract_profile_details(html, include_address=False, backend=None):
+    """Extract insurance/payment, specialties and address from a profile page in one pass.
+
+    The experience section is walked once to collect both the specialties and the
+    Insurance/Payment heading. With `html.parser` it returns the same result as the
+    per-field BeautifulSoup lookups it replaced; `parser_parity.py` compares them.
+
+    Args:
+        html (str): The profile page HTML.
+        include_address (bool): Whether to extract address information. Defaults to False.
+        backend: The parser backend to use. Defaults to the module-level `html_backend`.
+
+    Returns:
+        dict: A dictionary with 'Insurance/Payment', 'Specialties' and 'Address' lists.
+    """
+    backend = backend or html_backend
+    root = backend.parse(html)
+    insurance_payment = []
+    specialties = []
     address = []
-    address_section = soup.find('address')
-    
-    if address_section:
-        p_tag = address_section.find('p')
-        if p_tag:
-            # Split the text into lines and strip any leading/trailing whitespace
-            address = [line.strip() for line in p_tag.get_text(separator='\n').split('\n') if line.strip()]
-    return address
-
-def extract_insurance_payment(soup):
-    """Extract insurance/payment information from BeautifulSoup object as a list."""
-    insurance_payment_content = []
-    experience_section = soup.find('div', class_='nutritionist-details__experience')
-    
-    if experience_section:
-        insurance_heading = experience_section.find('h2', string=lambda text: text and 'Insurance/Payment' in text.strip())
-        if insurance_heading:
-            for sibling in insurance_heading.find_next_siblings():
-                if sibling.name == 'h2':
+
+    experience_section = backend.find_first(root, 'div', EXPERIENCE_SECTION_CLASS)
+    if experience_section is not None:
+        insurance_heading = None
+        for node in backend.descendants(experience_section):
+            tag = backend.tag(node)
+            if tag == 'p' and EXPERIENCE_ITEM_CLASS in backend.classes(node):
+                specialties.append(''.join(text.strip() for text in backend.strings(node)))
+            elif tag == 'h2' and insurance_heading is None:
+                heading_text = backend.single_string(node)
+                if heading_text and 'Insurance/Payment' in heading_text.strip():
+                    insurance_heading = node
+
+        if insurance_heading is not None:
+            for sibling in backend.next_siblings(insurance_heading):
+                tag = backend.tag(sibling)
+                if tag == 'h2':
                     break
-                if sibling.name == 'p':
-                    insurance_payment_content.append(sibling.get_text(strip=True))
-    
-    return insurance_payment_content
+                if tag == 'p':
+                    insurance_payment.append(''.join(text.strip() for text in backend.strings(sibling)))
 
-def extract_specialties(soup):
-    """Extract specialties information from BeautifulSoup object as a list."""
-    specialties = []
-    experience_section = soup.find('div', class_='nutritionist-details__experience')
-    
-    if experience_section:
-        specialties = [item.get_text(strip=True) for item in experience_section.find_all('p', class_='nutritionist-details__experience-item')]
+    if include_address:
+        address_section = backend.find_first(root, 'address')
+        p_tag = backend.find_first(address_section, 'p') if address_section is not None else None
+        if p_tag is not None:
+            lines = '\n'.join(backend.strings(p_tag)).split('\n')
+            address = [line.strip() for line in lines if line.strip()]
+
+    return {
+        'Insurance/Payment': insurance_payment,
+        'Specialties': specialties,
+        'Address': address
+    }
+
+
+class AsyncCollection:
+    """Runs the blocking pymongo calls for one collection on a dedicated writer thread.
+
+    Calls are queued to a single worker thread and awaited from the event loop, so
+    MongoDB latency overlaps with in-flight HTTP requests instead of stalling them.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mongo-writer')
 
-    return specialties
+    async def run(self, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` on the writer thread and return its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return await self.run(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, *args, limit=0, **kwargs):
+        """Return the matching documents as a list, at most `limit` of them (0 for all)."""
+        return await self.run(lambda: list(self.collection.find(*args, **kwargs).limit(limit)))
+
+    async def bulk_write(self, *args, **kwargs):
+        return await self.run(self.collection.bulk_write, *args, **kwargs)
+
+    def close(self):
+        """Wait for queued writes to finish and stop the writer thread."""
+        self._executor.shutdown(wait=True)
 
 
 async def connect_to_mongodb(uri, database_name, collection_name):
@@ -175,202 +586,757 @@ async def connect_to_mongodb(uri, database_name, collection_name):
         collection_name (str): The name of the MongoDB collection.
 
     Returns:
-        tuple: A tuple containing the MongoDB client and collection object.
+        tuple: A tuple containing the MongoDB client and an `AsyncCollection` wrapping
+            the collection.
     """
     try:
         client = pymongo.MongoClient(uri, retryWrites=True, retryReads=True)
         db = client[database_name]
         collection = db[collection_name]
         collection.create_index([("Email", pymongo.ASCENDING)], unique=True)
-        return client, collection
+        # Only records waiting for lazy enrichment carry the flag, so the index stays small
+        collection.create_index([("NeedsEnrichment", pymongo.ASCENDING)], sparse=True)
+        return client, AsyncCollection(collection)
     
     except PyMongoError as error:
         logging.error(f"Failed to connect to MongoDB: {error}")
         return None, None
 
 
-async def upsert_profiles_to_mongodb(collection, profiles_batch):
-    """Upsert profiles data into MongoDB, skipping duplicates based on email."""
+class SeenEmailIndex:
+    """Compact in-memory set of the Email keys already stored in MongoDB.
+
+    Emails are reduced to 64-bit BLAKE2 hashes kept in a sorted `array('Q')`, so each
+    known profile costs 8 bytes and a lookup is a binary search. Emails added during
+    the run are kept exactly in a small set and merged into the array once it grows.
+    With 64-bit hashes a false "already seen" is below one in a million even for
+    millions of stored profiles.
+    """
+
+    def __init__(self, emails=(), merge_threshold=10000):
+        self._hashes = array('Q', sorted({self._hash(email) for email in emails}))
+        self._recent = set()
+        self.merge_threshold = merge_threshold
+
+    @staticmethod
+    def _hash(email):
+        return int.from_bytes(hashlib.blake2b(email.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def __contains__(self, email):
+        if email in self._recent:
+            return True
+        key = self._hash(email)
+        position = bisect_left(self._hashes, key)
+        return position < len(self._hashes) and self._hashes[position] == key
+
+    def __len__(self):
+        return len(self._hashes) + len(self._recent)
+
+    def add(self, email):
+        """Record an email that has been stored during this run."""
+        if email in self:
+            return
+        self._recent.add(email)
+        if len(self._recent) >= self.merge_threshold:
+            self._merge()
+
+    def update(self, emails):
+        """Record several stored emails at once."""
+        for email in emails:
+            self.add(email)
+
+    def _merge(self):
+        merged = set(self._hashes)
+        merged.update(self._hash(email) for email in self._recent)
+        self._hashes = array('Q', sorted(merged))
+        self._recent = set()
+
+
+def load_seen_emails(collection):
+    """Load every stored Email key into a `SeenEmailIndex` using a projected cursor.
+
+    Args:
+        collection (pymongo.collection.Collection): The underlying MongoDB collection.
+
+    Returns:
+        SeenEmailIndex: The index of emails already present in the collection.
+    """
     try:
-        for profile in profiles_batch:
-            email = profile.get("Email", "")
-            if not email:
-                continue  
-            
-            existing_profile = collection.find_one({"Email": email})
-            if existing_profile:
-                logging.info(f"Profile with Email '{email}' already exists. Skipping.")
-                continue
+        cursor = collection.find({"Email": {"$exists": True}}, {"Email": 1, "_id": 0}, batch_size=10000)
+        seen_emails = SeenEmailIndex(doc["Email"] for doc in cursor if doc.get("Email"))
+    except PyMongoError as error:
+        logging.error(f"Failed to preload existing emails: {error}")
+        return SeenEmailIndex()
 
-            result = collection.update_one(
-                {"Email": email},
-                {"$set": profile},
-                upsert=True
-            )
-            
-            if result.matched_count > 0:
-                logging.info(f"Document with Email '{email}' updated.")
-            elif result.upserted_id is not None:
-                logging.info(f"New document with Email '{email}' inserted.")
-        
-    except DuplicateKeyError:
-        logging.warning("Duplicate document detected.")
+    logging.info(f"Preloaded {len(seen_emails)} existing profile emails.")
+    return seen_emails
+
+
+async def upsert_profiles_to_mongodb(collection, profiles_batch, seen_emails=None):
+    """Upsert profiles data into MongoDB, skipping duplicates based on email.
+
+    The whole batch is sent as one unordered `bulk_write`. Each profile is written
+    with `$setOnInsert`, so documents that already exist are matched but left untouched.
+
+    Args:
+        collection (AsyncCollection): The MongoDB collection object.
+        profiles_batch (list): The cleaned profiles to upsert.
+        seen_emails (SeenEmailIndex, optional): Index updated with every email now stored.
+
+    Returns:
+        dict: Counts of 'inserted', 'matched' (already stored), 'duplicates'
+            (repeated in the batch or rejected by the unique Email index) and 'failed'
+            (not written for any other reason, such as a lost connection).
+    """
+    counts = {'inserted': 0, 'matched': 0, 'duplicates': 0, 'failed': 0}
+    operations = []
+    operation_emails = []
+    batch_emails = set()
+
+    for profile in profiles_batch:
+        email = profile.get("Email", "")
+        if not email:
+            continue
+        if email in batch_emails:
+            counts['duplicates'] += 1
+            continue
+        batch_emails.add(email)
+        operation_emails.append(email)
+        operations.append(UpdateOne({"Email": email}, {"$setOnInsert": profile}, upsert=True))
+
+    if not operations:
+        return counts
+
+    failed_indexes = set()
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        counts['inserted'] = result.upserted_count
+        counts['matched'] = result.matched_count
+    except BulkWriteError as error:
+        details = error.details
+        counts['inserted'] = details.get('nUpserted', 0)
+        counts['matched'] = details.get('nMatched', 0)
+        for err in details.get('writeErrors', []):
+            if err.get('code') == 11000:
+                counts['duplicates'] += 1
+            else:
+                failed_indexes.add(err.get('index'))
+                logging.error(f"Failed to upsert document: {err.get('errmsg')}")
+        counts['failed'] = len(failed_indexes)
     except PyMongoError as error:
         logging.error(f"Failed to upsert documents: {error}")
+        counts['failed'] = len(operations)
+        return counts
+
+    if seen_emails is not None:
+        seen_emails.update(email for index, email in enumerate(operation_emails) if index not in failed_indexes)
+
+    for name, amount in counts.items():
+        record_log.count(name, amount)
+    record_log.event(
+        'upserted_batches', "Upserted batch of %d profiles: %d inserted, %d already existed, %d duplicates.",
+        len(profiles_batch), counts['inserted'], counts['matched'], counts['duplicates']
+    )
+    return counts
+
+
+async def upload_profiles(collection, profiles_batch, seen_emails=None):
+    """Upsert one batch of profiles. Returns True if every profile in it was committed."""
+    try:
+        counts = await upsert_profiles_to_mongodb(collection, profiles_batch, seen_emails=seen_emails)
+    except Exception as e:
+        logging.error(f"Failed to upload batch: {e}")
+        return False
+    return not counts['failed']
 
 
-def remove_empty_fields(d):
+def profile_url(profile):
+    """Return the absolute detail page URL of an API profile."""
+    return f"https://www.eatright.org{profile.get('Url', '')}"
+
+
+class ProfileFetchRegistry:
+    """In-run index of profile detail URLs with single-flight fetching.
+
+    `claim` lets the first occurrence of a URL in the run through and skips later ones,
+    including profiles still waiting in an upload batch or being fetched. `fetch`
+    coalesces concurrent requests for the same URL into one HTTP fetch and parse, and
+    keeps the most recent successful results so a repeat within the run needs no
+    request at all. Failed fetches (None) are not kept, so a later caller tries again.
     """
-    Recursively removes fields with empty or default values from a dictionary or list.
 
-    - Removes 'Address' if it's a dictionary with all empty values.
-    - For dictionaries, removes keys with None, empty strings, empty lists, or empty dictionaries.
-    - For lists, removes items that are None, empty strings, empty lists, or empty dictionaries.
+    def __init__(self, max_cached=10000):
+        self.max_cached = max_cached
+        self._claimed = set()
+        self._in_flight = {}
+        self._results = OrderedDict()
+        self.stats = {'claimed': 0, 'skipped': 0, 'fetched': 0, 'coalesced': 0, 'cache_hits': 0}
+
+    def claim(self, url, scope=None):
+        """Return True the first time `url` is seen in this run, False afterwards.
+
+        Claims are tracked per `scope`, so plans that build different records from the
+        same page (with or without the detail page address) each get their own record
+        while still sharing the cached fetch.
+        """
+        key = (scope, url)
+        if key in self._claimed:
+            self.stats['skipped'] += 1
+            return False
+        self._claimed.add(key)
+        self.stats['claimed'] += 1
+        return True
+
+    async def fetch(self, url, fetcher):
+        """Return the details for `url`, calling `fetcher()` only if no fetch is running or cached."""
+        if url in self._results:
+            self._results.move_to_end(url)
+            self.stats['cache_hits'] += 1
+            return self._results[url]
+
+        task = self._in_flight.get(url)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fetcher())
+        self._in_flight[url] = task
+        self.stats['fetched'] += 1
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._in_flight.pop(url, None)
+
+        if result is None:
+            return None
+        self._results[url] = result
+        if len(self._results) > self.max_cached:
+            self._results.popitem(last=False)
+        return result
+
+    @property
+    def saved_fetches(self):
+        return self.stats['skipped'] + self.stats['coalesced'] + self.stats['cache_hits']
+
+    def log_summary(self):
+        stats = self.stats
+        logging.info(
+            f"Detail fetches: {stats['fetched']} made, {self.saved_fetches} saved "
+            f"({stats['skipped']} repeated URLs skipped, {stats['coalesced']} coalesced, {stats['cache_hits']} cache hits)."
+        )
+
+
+async def fetch_profile_details(profiles, session, include_address=False, concurrency=5, fetch_registry=None, limiter=None):
+    """Fetch the detail pages of a page of profiles with a bounded worker pool.
+
+    Every fetch still goes through the shared rate limiter; the pool only caps how
+    many detail requests are in flight at once.
+
+    Args:
+        profiles (list): The API profiles whose detail pages should be fetched.
+        session (ClientSession): The aiohttp session to use for making requests.
+        include_address (bool): Whether to extract address information. Defaults to False.
+        concurrency (int): Maximum number of concurrent detail fetches. Defaults to 5.
+        fetch_registry (ProfileFetchRegistry, optional): Shares fetches of the same URL.
+            Its cached results always include the address.
+        limiter (AdaptiveRateLimiter, optional): The rate limiter to use. Defaults to `profile_limiter`.
 
     Returns:
-    dict or list: The cleaned data structure.
+        list: The extraction results, in the same order as `profiles`.
     """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def worker(profile):
+        url = profile_url(profile)
+        async with semaphore:
+            if fetch_registry is None:
+                return await extract_insurance_payment_and_specialties(session, url, include_address=include_address, limiter=limiter)
+            return await fetch_registry.fetch(
+                url, lambda: extract_insurance_payment_and_specialties(session, url, include_address=True, limiter=limiter)
+            )
 
-    if isinstance(d, dict):
-        if 'Address' in d:
-            address = d['Address']
-            if isinstance(address, dict) and not any(address.values()):
-                d.pop('Address')
-        
-        return {k: remove_empty_fields(v) for k, v in d.items() if v not in [None, "", [], {}]}
-    elif isinstance(d, list):
-        return [remove_empty_fields(v) for v in d if v not in [None, "", [], {}]]
-    else:
-        return d
+    return await asyncio.gather(*(worker(profile) for profile in profiles))
 
-async def process_profiles(profiles, session, collection, upload_batch_size, include_address=False):
+
+async def process_profiles(profiles, session, collection, upload_batch_size, include_address=False, detail_concurrency=5, seen_emails=None, fetch_registry=None, lazy_enrichment=False):
     """Process and upload profiles data to MongoDB.
 
     Args:
         profiles (list): A list of profiles data to process.
         session (ClientSession): The aiohttp session to use for making requests.
-        collection (pymongo.collection.Collection): The MongoDB collection object.
+        collection (AsyncCollection): The MongoDB collection object.
         upload_batch_size (int): The batch size for uploading to MongoDB.
+        include_address (bool): Whether to extract address information from the detail page.
+        detail_concurrency (int): Maximum number of concurrent detail page fetches.
+        seen_emails (SeenEmailIndex, optional): Preloaded index of stored emails. When given,
+            existing profiles are skipped without querying MongoDB.
+        fetch_registry (ProfileFetchRegistry, optional): In-run URL index; profiles whose
+            URL was already handled in this run are skipped.
+        lazy_enrichment (bool): Store the API fields right away, flagged with
+            `NeedsEnrichment`, and leave the detail pages to `ProfileEnricher`.
+            Profiles whose detail page fails inline are stored the same way.
+
+    Returns:
+        bool: True if every upload batch was committed to MongoDB.
     """
+    committed = True
     profiles_to_upload = []
+    pending_profiles = []
+    # Lazy records keep the API address until the enrichment pass replaces it
+    normalize_profile = get_profile_normalizer(include_address and not lazy_enrichment)
 
     for profile in profiles:
         email = profile.get("Email", "")
         if not email:
             continue  
 
-        existing_profile = collection.find_one({"Email": email})
+        if seen_emails is not None:
+            existing_profile = email in seen_emails
+        else:
+            existing_profile = await collection.find_one({"Email": email}, {"_id": 1})
         if existing_profile:
-            logging.info(f"Profile with Email '{email}' already exists. Skipping.")
+            record_log.event('skipped_existing', "Profile with Email '%s' already exists. Skipping.", email)
             continue
 
-        url = f"https://www.eatright.org{profile.get('Url', '')}"
-        insurance_payment_specialties_and_address = await extract_insurance_payment_and_specialties(session, url, include_address=include_address)
-
-        if insurance_payment_specialties_and_address is None:
-            logging.warning(f"Skipping profile for {email} due to failed extraction.")
+        if fetch_registry is not None and not fetch_registry.claim(profile_url(profile), scope=include_address):
+            record_log.event('skipped_repeat', "Profile with Email '%s' was already handled in this run. Skipping.", email)
             continue
 
-        address = profile.get('Address', {})
-        if address is None:
-            address = {}
-
-        phone = profile.get('Phone')
-        if phone is None:
-            phone = {}
-        
-        processed_profile = {
-            "FullName": profile.get('FullName', ""),
-            "Address": {
-                "Name": address.get('Name', ""),
-                "Line1": address.get('Line1', ""),
-                "Line2": address.get('Line2', ""),
-                "Line3": address.get('Line3', ""),
-                "City": address.get('City', ""),
-                "State": address.get('State', ""),
-                "ZipCode": address.get('ZipCode', ""),
-            },
-            "Locations": profile.get('Locations', []),  
-            "Phone": {
-                "AreaCode": phone.get('AreaCode', ""),
-                "Number": phone.get('Number', ""),
-                "Extension": phone.get('Extension', ""),
-            },
-            "Email": email,
-            "Website": profile.get('Website', ""),
-            "Insurance/Payment": insurance_payment_specialties_and_address['Insurance/Payment'] or [],
-            "Specialties": insurance_payment_specialties_and_address['Specialties'] or [],
-        }
+        pending_profiles.append(profile)
+
+    if lazy_enrichment:
+        details = [EMPTY_DETAILS] * len(pending_profiles)
+    else:
+        details = await fetch_profile_details(
+            pending_profiles, session, include_address=include_address, concurrency=detail_concurrency, fetch_registry=fetch_registry
+        )
 
-        if include_address:
-            processed_profile["Address"] = insurance_payment_specialties_and_address['Address'] or []
+    for profile, insurance_payment_specialties_and_address in zip(pending_profiles, details):
+        email = profile["Email"]
 
-        cleaned_profile = remove_empty_fields(processed_profile)
+        if insurance_payment_specialties_and_address is None:
+            # Keep the API fields and leave the detail page to the enrichment pass
+            record_log.event('failed_extraction', "Detail page of %s failed. Storing it for enrichment.", email, level=logging.WARNING)
+            cleaned_profile = get_profile_normalizer(False)(profile, EMPTY_DETAILS)
+            needs_enrichment = True
+        else:
+            cleaned_profile = normalize_profile(profile, insurance_payment_specialties_and_address)
+            needs_enrichment = lazy_enrichment
+        if needs_enrichment:
+            cleaned_profile['Url'] = profile.get('Url', '')
+            cleaned_profile['NeedsEnrichment'] = True
+            if include_address:
+                cleaned_profile['EnrichAddress'] = True
         profiles_to_upload.append(cleaned_profile)
 
         if len(profiles_to_upload) >= upload_batch_size:
-            try:
-                await upsert_profiles_to_mongodb(collection, profiles_to_upload)
-            except Exception as e:
-                logging.error(f"Failed to upload batch: {e}")
+            if not await upload_profiles(collection, profiles_to_upload, seen_emails=seen_emails):
+                committed = False
             profiles_to_upload = []
 
-    if profiles_to_upload:
-        await upsert_profiles_to_mongodb(collection, profiles_to_upload)
+    if profiles_to_upload and not await upload_profiles(collection, profiles_to_upload, seen_emails=seen_emails):
+        committed = False
+    return committed
 
 
-async def fetch_profiles_batch(api_url, params, batch_size, upload_batch_size, fetch_type='city', collection=None, session=None):
-    """Fetch and process profiles data in batches.
+class ProfileEnricher:
+    """Background pass that fills in the detail page fields of lazily stored records.
+
+    Records flagged with `NeedsEnrichment` are read from MongoDB in batches, their
+    detail pages are fetched with their own concurrency and rate limiter, and each
+    record is updated with the same fields an inline sweep would have stored. The
+    flag lives in MongoDB, so an interrupted pass simply continues on the next run.
+    Records whose detail page fails keep the flag and are left for the next run.
+    """
+
+    def __init__(self, collection, session, concurrency=5, batch_size=100, poll_interval=15, fetch_registry=None, limiter=None):
+        """
+        Args:
+            collection (AsyncCollection): The MongoDB collection object.
+            session (ClientSession): The aiohttp session to use for making requests.
+            concurrency (int): Maximum number of concurrent detail page fetches.
+            batch_size (int): Number of flagged records read and updated at a time.
+            poll_interval (float): Seconds to wait for new flagged records while a sweep is running.
+            fetch_registry (ProfileFetchRegistry, optional): Shares fetches with the sweep.
+            limiter (AdaptiveRateLimiter, optional): Defaults to `enrichment_limiter`.
+        """
+        self.collection = collection
+        self.session = session
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.fetch_registry = fetch_registry
+        self.limiter = limiter
+        self.enriched = 0
+        # Records that failed in this run; they stay flagged but are not read again
+        self.failed_ids = set()
+
+    async def run(self, sweep_done=None):
+        """Enrich flagged records until none are left and `sweep_done` is set.
+
+        Args:
+            sweep_done (asyncio.Event, optional): Set when the sweep that stores new
+                flagged records has finished. Without it, the pass stops as soon as no
+                flagged records are left.
+        """
+        while True:
+            try:
+                records = await self.collection.find(
+                    {'NeedsEnrichment': True, '_id': {'$nin': list(self.failed_ids)}},
+                    {'Url': 1, 'Email': 1, 'EnrichAddress': 1}, limit=self.batch_size
+                )
+            except PyMongoError as error:
+                logging.error(f"Failed to read records to enrich: {error}")
+                break
+
+            if not records:
+                if sweep_done is None or sweep_done.is_set():
+                    break
+                try:
+                    await asyncio.wait_for(sweep_done.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if not await self.enrich(records):
+                break
+
+        logging.info(f"Enrichment pass finished: {self.enriched} records enriched, {len(self.failed_ids)} left flagged after failed fetches.")
+
+    async def enrich(self, records):
+        """Fetch the detail pages of `records` and update them. Returns False if the update failed."""
+        details = await fetch_profile_details(
+            records, self.session, include_address=True, concurrency=self.concurrency,
+            fetch_registry=self.fetch_registry, limiter=self.limiter or enrichment_limiter
+        )
+
+        operations = []
+        for record, record_details in zip(records, details):
+            if record_details is None:
+                self.failed_ids.add(record['_id'])
+                record_log.event('enrich_failed', "Detail page of %s failed. Leaving it flagged.", record.get('Email'), level=logging.WARNING)
+                continue
+            include_address = record.get('EnrichAddress', False)
+            fields = get_profile_normalizer(include_address)({}, record_details)
+            update = {'$unset': {'NeedsEnrichment': '', 'EnrichAddress': '', 'Url': ''}}
+            detail_fields = {key: fields[key] for key in EMPTY_DETAILS if key in fields}
+            if detail_fields:
+                update['$set'] = detail_fields
+            if include_address and 'Address' not in detail_fields:
+                update['$unset']['Address'] = ''
+            operations.append(UpdateOne({'_id': record['_id']}, update))
+
+        if not operations:
+            return True
+
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as error:
+            logging.error(f"Failed to update enriched records: {error}")
+            return False
+
+        self.enriched += len(operations)
+        record_log.count('enriched', len(operations))
+        record_log.event('enriched_batches', "Enriched %d records.", len(operations))
+        return True
+
+
+class SweepCheckpoint:
+    """Progress of a sweep, saved atomically so an interrupted run can resume.
+
+    For each fetch type the file records the locations that are finished and, for
+    locations in progress, the next page to fetch. It is rewritten after every page
+    whose profiles have been committed to MongoDB.
+    """
+
+    def __init__(self, file_path, run_key):
+        self.file_path = file_path
+        self.run_key = run_key
+        self.completed = {}
+        self.pages = {}
+
+    @classmethod
+    def load(cls, file_path, run_key):
+        """Load the checkpoint for `run_key`, or start a new one if none matches."""
+        checkpoint = cls(file_path, run_key)
+        try:
+            with open(file_path) as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            logging.info(f"No checkpoint found at '{file_path}'. Starting from the beginning.")
+            return checkpoint
+        except json.JSONDecodeError:
+            logging.error(f"Checkpoint file '{file_path}' is corrupt. Starting from the beginning.")
+            return checkpoint
+
+        if state.get('run_key') != run_key:
+            logging.warning(f"Checkpoint '{file_path}' belongs to another run ({state.get('run_key')}). Starting from the beginning.")
+            return checkpoint
+
+        checkpoint.completed = {fetch_type: set(locations) for fetch_type, locations in state.get('completed', {}).items()}
+        checkpoint.pages = state.get('pages', {})
+        logging.info(f"Resuming from checkpoint '{file_path}': {sum(len(done) for done in checkpoint.completed.values())} locations already done.")
+        return checkpoint
+
+    def save(self):
+        """Write the checkpoint to a temporary file and atomically replace the old one."""
+        state = {
+            'run_key': self.run_key,
+            'completed': {fetch_type: sorted(locations) for fetch_type, locations in self.completed.items()},
+            'pages': self.pages,
+        }
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.file_path)
+
+    def is_done(self, fetch_type, location):
+        return location in self.completed.get(fetch_type, ())
+
+    def start_page(self, fetch_type, location):
+        """Return the first page that still has to be fetched for `location`."""
+        return self.pages.get(fetch_type, {}).get(location, 1)
+
+    def page_done(self, fetch_type, location, page):
+        """Record that `page` of `location` has been committed to MongoDB."""
+        self.pages.setdefault(fetch_type, {})[location] = page + 1
+        self.save()
+
+    def location_done(self, fetch_type, location):
+        """Record that every page of `location` has been processed."""
+        self.pages.get(fetch_type, {}).pop(location, None)
+        self.completed.setdefault(fetch_type, set()).add(location)
+        self.save()
+
+
+async def fetch_location_profiles(api_url, params, location, batch_size, upload_batch_size, fetch_type, collection, session, batch_counter, detail_concurrency=5, seen_emails=None, page_delay=(1, 5), checkpoint=None, fetch_registry=None, page_fanout=True, lazy_enrichment=False):
+    """Fetch and process every page of profiles for a single location.
+
+    When the first response reports a total count, the remaining pages are requested
+    concurrently and processed in page order; otherwise pages are fetched one by one
+    until a short or empty page comes back. A concurrent page that fails is requested
+    again on its own before the following pages are processed.
+
+    A page is only checkpointed once all of it is stored in MongoDB, and the location
+    is only marked done once it is exhausted. After a failed request or a failed write,
+    the saved page is kept for `--resume`.
 
     Args:
         api_url (str): The API URL to fetch data from.
-        params (dict): The query parameters for the API request.
+        params (dict): The base query parameters; a copy is used for this location.
+        location (str): The ZIP code or state to fetch.
         batch_size (int): The number of profiles to fetch per batch.
         upload_batch_size (int): The batch size for uploading to MongoDB.
         fetch_type (str): The type of location to fetch data for ('city' or 'state').
-        collection (pymongo.collection.Collection): The MongoDB collection object.
+        collection (AsyncCollection): The MongoDB collection object.
         session (ClientSession): The aiohttp session to use for making requests.
+        batch_counter (itertools.count): Run-wide counter used to number batches in the log.
+        detail_concurrency (int): Maximum number of concurrent detail page fetches per page.
+        seen_emails (SeenEmailIndex, optional): Preloaded index of stored emails.
+        page_delay (tuple, optional): (min, max) seconds to sleep between pages and
+            locations. None disables the sleeps and leaves throttling to the rate limiter.
+        checkpoint (SweepCheckpoint, optional): Progress record updated after each committed page.
+        fetch_registry (ProfileFetchRegistry, optional): In-run URL index and fetch coalescer.
+        page_fanout (bool): Request the remaining pages concurrently when the total is known.
+        lazy_enrichment (bool): Store API records right away and leave detail pages to `ProfileEnricher`.
     """
-    locations = cities if fetch_type == 'city' else states
-    include_address = fetch_type == 'state'  
-    batch_number = 1  
-
-    for location in locations:
-        params[fetch_type] = location
-        current_page = 1
+    include_address = fetch_type == 'state'
+    current_page = checkpoint.start_page(fetch_type, location) if checkpoint else 1
+
+    def page_params(page):
+        page_query = dict(params)
+        page_query[fetch_type] = location
+        page_query['page'] = page
+        page_query['perPage'] = batch_size
+        page_query['type'] = 'in-person' if fetch_type == 'city' else 'telehealth'
+        return page_query
+
+    logging.info(f"Fetching page {current_page} for {fetch_type} {location} with {batch_size} profiles...")
+    profiles, total = await fetch_profiles_result(session, api_url, page_params(current_page))
+
+    # With a total count, request the remaining pages at once; the limiter still paces them.
+    page_tasks = {}
+    fanned_out = bool(page_fanout and total)
+    if fanned_out:
+        last_page = math.ceil(total / batch_size)
+        page_tasks = {
+            page: asyncio.ensure_future(fetch_profiles_page(session, api_url, page_params(page)))
+            for page in range(current_page + 1, last_page + 1)
+        }
+        if page_tasks:
+            logging.info(f"{fetch_type} {location} has {total} profiles. Requesting pages {current_page + 1}-{last_page} concurrently.")
 
+    exhausted = False
+    try:
         while True:
-            params['page'] = current_page
-            params['perPage'] = batch_size
-            params['type'] = 'in-person' if fetch_type == 'city' else 'telehealth'
+            batch_number = next(batch_counter)
 
-            logging.info(f"Batch {batch_number}: Fetching page {current_page} for {fetch_type} {location} with {batch_size} profiles...")
-            profiles = await fetch_profiles_page(session, api_url, params)
+            if profiles is None:
+                logging.error(f"Batch {batch_number}: Failed to fetch page {current_page} for {fetch_type} {location}. Leaving it for a resumed run.")
+                break
 
             if not profiles:
+                exhausted = True
                 logging.info(f"Batch {batch_number}: No more profiles found for {fetch_type} {location}. Moving to next location.")
                 break
 
             logging.info(f"Batch {batch_number}: Fetched {len(profiles)} profiles on page {current_page}. Processing each profile...")
 
-            await process_profiles(profiles, session, collection, upload_batch_size, include_address=include_address)
+            committed = await process_profiles(
+                profiles, session, collection, upload_batch_size, include_address=include_address,
+                detail_concurrency=detail_concurrency, seen_emails=seen_emails, fetch_registry=fetch_registry,
+                lazy_enrichment=lazy_enrichment
+            )
+            if not committed:
+                # Later pages would move the saved page past this one
+                logging.error(f"Batch {batch_number}: Page {current_page} for {fetch_type} {location} was not fully stored. Leaving it for a resumed run.")
+                break
 
             if len(profiles) < batch_size:
+                exhausted = True
                 break
 
+            if checkpoint:
+                checkpoint.page_done(fetch_type, location, current_page)
+
             current_page += 1
-            batch_number += 1  
 
-            await asyncio.sleep(random.uniform(1, 5))
+            if fanned_out:
+                page_task = page_tasks.pop(current_page, None)
+                if page_task is None:
+                    exhausted = True
+                    break
+                profiles = await page_task
+                if profiles is not None:
+                    continue
+                # Request the failed page again; the remaining pages stay in flight
+                logging.warning(f"Page {current_page} for {fetch_type} {location} failed. Requesting it again.")
+
+            if page_delay:
+                await asyncio.sleep(random.uniform(*page_delay))
+
+            logging.info(f"Fetching page {current_page} for {fetch_type} {location} with {batch_size} profiles...")
+            profiles = await fetch_profiles_page(session, api_url, page_params(current_page))
+    finally:
+        for page_task in page_tasks.values():
+            page_task.cancel()
+
+    if checkpoint and exhausted:
+        checkpoint.location_done(fetch_type, location)
+
+    if page_delay:
+        await asyncio.sleep(random.uniform(*page_delay))
+
+
+async def fetch_profiles_batch(api_url, params, batch_size, upload_batch_size, fetch_type='city', collection=None, session=None, detail_concurrency=5, seen_emails=None, location_concurrency=1, page_delay=(1, 5), locations=None, checkpoint=None, fetch_registry=None, page_fanout=True, lazy_enrichment=False):
+    """Fetch and process profiles data in batches.
+
+    Locations are fed through a queue to `location_concurrency` consumers, so several
+    ZIP codes or states are paged at once. The shared rate limiter remains the only
+    throttle when `page_delay` is disabled.
 
-        await asyncio.sleep(random.uniform(1, 5))
+    Args:
+        api_url (str): The API URL to fetch data from.
+        params (dict): The query parameters for the API request.
+        batch_size (int): The number of profiles to fetch per batch.
+        upload_batch_size (int): The batch size for uploading to MongoDB.
+        fetch_type (str): The type of location to fetch data for ('city' or 'state').
+        collection (AsyncCollection): The MongoDB collection object.
+        session (ClientSession): The aiohttp session to use for making requests.
+        detail_concurrency (int): Maximum number of concurrent detail page fetches per page.
+        seen_emails (SeenEmailIndex, optional): Preloaded index of stored emails.
+        location_concurrency (int): Number of locations fetched at the same time. Defaults to 1.
+        page_delay (tuple, optional): (min, max) seconds to sleep between pages and
+            locations, or None to disable the sleeps.
+        locations (iterable, optional): Locations to fetch. Defaults to the planned ZIP
+            codes of the configured list, or `states`.
+        checkpoint (SweepCheckpoint, optional): Progress record; finished locations are
+            skipped and locations in progress continue from their next page.
+        fetch_registry (ProfileFetchRegistry, optional): In-run URL index and fetch coalescer.
+        page_fanout (bool): Request the remaining pages of a location concurrently when
+            the API reports a total count.
+        lazy_enrichment (bool): Store API records right away and leave detail pages to `ProfileEnricher`.
+    """
+    if locations is None:
+        locations = plan_zip_codes() if fetch_type == 'city' else states
+    if checkpoint:
+        locations = [location for location in locations if not checkpoint.is_done(fetch_type, location)]
+    worker_count = max(1, location_concurrency)
+    queue = asyncio.Queue(maxsize=worker_count * 2)
+    batch_counter = itertools.count(1)
+
+    async def producer():
+        for location in locations:
+            await queue.put(location)
+        for _ in range(worker_count):
+            await queue.put(None)
+
+    async def consumer():
+        while True:
+            location = await queue.get()
+            try:
+                if location is None:
+                    return
+                await fetch_location_profiles(
+                    api_url, params, location, batch_size, upload_batch_size, fetch_type, collection, session,
+                    batch_counter, detail_concurrency=detail_concurrency, seen_emails=seen_emails, page_delay=page_delay,
+                    checkpoint=checkpoint, fetch_registry=fetch_registry, page_fanout=page_fanout,
+                    lazy_enrichment=lazy_enrichment
+                )
+            except Exception as error:
+                logging.error(f"Failed to process {fetch_type} {location}: {error}")
+            finally:
+                queue.task_done()
+
+    await asyncio.gather(producer(), *(consumer() for _ in range(worker_count)))
+
+
+def plan_locations(fetch_type, zip_list, zip_info):
+    """Return the locations to sweep: planned ZIP codes for 'city', every state for 'state'."""
+    if fetch_type == 'state':
+        return states
+
+    locations = plan_zip_codes(zip_list, zip_info=zip_info)
+    logging.info(f"Planned {len(locations)} ZIP codes for zip_{zip_list}.")
+    coverage = zip_info.get("coverage", {})
+    if coverage.get("enabled"):
+        locations, stats = plan_coverage(
+            locations,
+            coverage.get("radius_miles", 10),
+            radius_factor=coverage.get("radius_factor", 0.8),
+            target_coverage=coverage.get("target_coverage", 1.0),
+        )
+        logging.info(
+            f"Coverage plan: {stats['queries']} of {stats['targets']} ZIP queries "
+            f"({stats['reduction']:.0%} fewer), estimated coverage {stats['coverage']:.1%}."
+        )
+    return locations
+
+
+def parse_args():
+    """Parse the command line options."""
+    parser = argparse.ArgumentParser(description="Fetch nutrition expert profiles from EatRight.org.")
+    parser.add_argument('--resume', action='store_true', help="Continue from the last committed page in the checkpoint file.")
+    parser.add_argument('--enrich-only', action='store_true', help="Only fetch detail pages for records stored by a lazy sweep.")
+    return parser.parse_args()
 
 
 async def main():
     """Main entry point for the script."""
+    args = parse_args()
+    setup_logging(log_file)
     config = load_config()
+    record_log.configure(**config.get("logging", {}))
     batch_size = config["batch_size"]
     upload_batch_size = config["upload_batch_size"]
+    detail_concurrency = config.get("detail_concurrency", 5)
+    location_concurrency = config.get("location_concurrency", 1)
+    page_delay = config.get("page_delay", [1, 5])
+    page_fanout = config.get("page_fanout", True)
+    enrichment = config.get("enrichment", {})
+    lazy_enrichment = enrichment.get("mode", "inline") == "lazy"
     api_url = config["api_url"]
     zip_info = config.get("zip_info", {})
     zip_list= zip_info.get("zip_list_number", 0)
@@ -380,11 +1346,14 @@ async def main():
         logging.error(f"Invalid zip_list value: {zip_list}. It must be between 1 and 199. Please change the value in config.json")
         return
 
-    fetch_type = input("Enter fetch type ('city' or 'state'): ").strip().lower()
+    if args.enrich_only:
+        fetch_type = 'enrich'
+    else:
+        fetch_type = input("Enter fetch type ('city', 'state' or 'both'): ").strip().lower()
 
-    if fetch_type not in ['city', 'state']:
-        print("Invalid fetch type. Please enter 'city' or 'state'.")
-        return
+        if fetch_type not in ['city', 'state', 'both']:
+            print("Invalid fetch type. Please enter 'city', 'state' or 'both'.")
+            return
 
     client, collection = await connect_to_mongodb(
         uri=config["mongodb_uri"],
@@ -392,13 +1361,75 @@ async def main():
         collection_name=config["collection_name"]
     )
 
-    if not collection:
+    if collection is None:
         logging.error("MongoDB connection failed. Exiting the script.")
         return
 
+    seen_emails = load_seen_emails(collection.collection)
+    configure_html_backend(config.get("html_parser", "html.parser"))
+    configure_rate_limits(config.get("rate_limits", {}))
+    parse_workers = config.get("parse_workers", 0)
+    configure_parse_pool(parse_workers)
+
+    if args.enrich_only:
+        fetch_types = []
+    else:
+        fetch_types = ['city', 'state'] if fetch_type == 'both' else [fetch_type]
+    plans = {plan_type: plan_locations(plan_type, zip_list, zip_info) for plan_type in fetch_types}
+
+    checkpoint_file = config.get("checkpoint_file", "checkpoint.json")
+    run_key = f"{fetch_type}:zip_{zip_list}"
+    if args.resume:
+        checkpoint = SweepCheckpoint.load(checkpoint_file, run_key)
+    else:
+        checkpoint = SweepCheckpoint(checkpoint_file, run_key)
+
+    # One registry for every plan, so 'both' shares the detail cache and dedupe index
+    fetch_registry = ProfileFetchRegistry()
+    loop_lag = LoopLagMonitor()
+    loop_lag.start()
+
     async with ClientSession() as session:
-        await fetch_profiles_batch(api_url, {}, batch_size, upload_batch_size, fetch_type=fetch_type, collection=collection, session=session)
+        sweep_done = asyncio.Event()
+
+        async def sweep():
+            try:
+                await asyncio.gather(*(
+                    fetch_profiles_batch(
+                        api_url, {}, batch_size, upload_batch_size, fetch_type=plan_type, collection=collection, session=session,
+                        detail_concurrency=detail_concurrency, seen_emails=seen_emails,
+                        location_concurrency=location_concurrency, page_delay=page_delay,
+                        locations=locations, checkpoint=checkpoint, fetch_registry=fetch_registry, page_fanout=page_fanout,
+                        lazy_enrichment=lazy_enrichment
+                    )
+                    for plan_type, locations in plans.items()
+                ))
+            finally:
+                sweep_done.set()
+
+        tasks = [sweep()]
+        if lazy_enrichment or args.enrich_only:
+            enricher = ProfileEnricher(
+                collection, session,
+                concurrency=enrichment.get("concurrency", detail_concurrency),
+                batch_size=enrichment.get("batch_size", 100),
+                poll_interval=enrichment.get("poll_interval", 15),
+                fetch_registry=fetch_registry,
+            )
+            tasks.append(enricher.run(sweep_done))
+        await asyncio.gather(*tasks)
+
+    await loop_lag.stop()
+    lag = loop_lag.summary()
+    logging.info(
+        f"Event loop lag with parse pool {'on' if parse_workers else 'off'}: "
+        f"avg {lag['avg_ms']:.1f} ms, p95 {lag['p95_ms']:.1f} ms, max {lag['max_ms']:.1f} ms."
+    )
+    fetch_registry.log_summary()
+    record_log.flush()
+    configure_parse_pool(0)
 
+    collection.close()
     if client:
         client.close()
 
@@ -0,0 +1,126 @@
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+import requests
+from bs4 import BeautifulSoup
+
+from nutritionist_scraper import HTML_BACKENDS, extract_profile_details
+
+SAVED_PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_profiles')
+
+
+def extract_address(soup):
+    """Extract address information from BeautifulSoup object as a list."""
+    address = []
+    address_section = soup.find('address')
+
+    if address_section:
+        p_tag = address_section.find('p')
+        if p_tag:
+            # Split the text into lines and strip any leading/trailing whitespace
+            address = [line.strip() for line in p_tag.get_text(separator='\n').split('\n') if line.strip()]
+    return address
+
+
+def extract_insurance_payment(soup):
+    """Extract insurance/payment information from BeautifulSoup object as a list."""
+    insurance_payment_content = []
+    experience_section = soup.find('div', class_='nutritionist-details__experience')
+
+    if experience_section:
+        insurance_heading = experience_section.find('h2', string=lambda text: text and 'Insurance/Payment' in text.strip())
+        if insurance_heading:
+            for sibling in insurance_heading.find_next_siblings():
+                if sibling.name == 'h2':
+                    break
+                if sibling.name == 'p':
+                    insurance_payment_content.append(sibling.get_text(strip=True))
+
+    return insurance_payment_content
+
+
+def extract_specialties(soup):
+    """Extract specialties information from BeautifulSoup object as a list."""
+    specialties = []
+    experience_section = soup.find('div', class_='nutritionist-details__experience')
+
+    if experience_section:
+        specialties = [item.get_text(strip=True) for item in experience_section.find_all('p', class_='nutritionist-details__experience-item')]
+
+    return specialties
+
+
+def legacy_profile_details(html):
+    """The per-field BeautifulSoup lookups `extract_profile_details` replaced."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return {
+        'Insurance/Payment': extract_insurance_payment(soup),
+        'Specialties': extract_specialties(soup),
+        'Address': extract_address(soup),
+    }
+
+
+def save_profile_pages(urls, directory):
+    """Download profile pages into `directory` for later parity runs."""
+    os.makedirs(directory, exist_ok=True)
+    for index, url in enumerate(urls, start=1):
+        response = requests.get(url, timeout=50)
+        response.raise_for_status()
+        with open(os.path.join(directory, f'profile_saved_{index}.html'), 'w', encoding='utf-8') as file:
+            file.write(response.text)
+    print(f"Saved {len(urls)} profile pages to {directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that every installed parser backend extracts the same profile fields as the legacy BeautifulSoup lookups.")
+    parser.add_argument('--pages', default=SAVED_PROFILES_DIR, help="Directory of saved profile pages (*.html).")
+    parser.add_argument('--save', nargs='+', metavar='URL', help="Download these profile pages into --pages first.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions; the best one is reported.")
+    args = parser.parse_args()
+
+    if args.save:
+        save_profile_pages(args.save, args.pages)
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.pages, '*.html'))):
+        with open(path, encoding='utf-8') as file:
+            pages[os.path.basename(path)] = file.read()
+    if not pages:
+        parser.error(f"No saved profile pages in {args.pages}. Save some with --save URL [URL ...].")
+
+    expected = {name: legacy_profile_details(html) for name, html in pages.items()}
+    legacy_time = min(timeit.repeat(lambda: [legacy_profile_details(html) for html in pages.values()], number=1, repeat=args.repeat))
+    print(f"{len(pages)} pages. Legacy lookups: {legacy_time * 1000:.1f} ms")
+
+    default_matches = True
+    for backend_name, backend in HTML_BACKENDS.items():
+        if backend is None:
+            print(f"{backend_name}: not installed")
+            continue
+        mismatches = [
+            (name, expected[name], actual)
+            for name, actual in (
+                (name, extract_profile_details(html, include_address=True, backend=backend)) for name, html in pages.items()
+            )
+            if actual != expected[name]
+        ]
+        backend_time = min(timeit.repeat(
+            lambda: [extract_profile_details(html, include_address=True, backend=backend) for html in pages.values()],
+            number=1, repeat=args.repeat
+        ))
+        verdict = "identical output" if not mismatches else f"{len(mismatches)} pages differ"
+        print(f"{backend_name}: {verdict}, {backend_time * 1000:.1f} ms ({legacy_time / backend_time:.2f}x)")
+        for name, legacy, actual in mismatches:
+            print(f"  {name}: expected {legacy}, got {actual}")
+        if mismatches and backend is HTML_BACKENDS['html.parser']:
+            default_matches = False
+
+    # The default backend must match; the others are only safe on pages where they agree
+    sys.exit(0 if default_matches else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Schema-driven normalizer for nutrition expert profile records.
+
+The record layout is declared once as `PROFILE_SCHEMA` and compiled into a flat
+Python function that maps an API profile and its detail page fields to the stored
+record, applies defaults and prunes empty values in a single pass. It produces the
+same records as building the nested dict and running the old `remove_empty_fields`
+cleanup on it; `normalizer_benchmark.py` keeps that cleanup to compare against.
+"""
+from functools import lru_cache
+
+# Types whose empty values are pruned, like `v in [None, "", [], {}]`
+EMPTY_TYPES = (str, list, dict)
+CONTAINER_TYPES = (list, dict)
+
+
+class SchemaField:
+    """One field of the stored profile record.
+
+    Args:
+        name (str): The key in the stored record.
+        source (str, optional): Where the value comes from. Defaults to `name`.
+        origin (str): 'profile' for the API record or 'details' for the detail page fields.
+        children (tuple, optional): Sub-fields for a nested group read from a dict.
+        keep_empty_group (bool): Keep the group (possibly as `{}`) even when every
+            sub-field is empty. Groups are dropped otherwise.
+        detail_override (str, optional): Detail page field that replaces this one when
+            the address is taken from the detail page.
+    """
+    __slots__ = ('name', 'source', 'origin', 'children', 'keep_empty_group', 'detail_override')
+
+    def __init__(self, name, source=None, origin='profile', children=(), keep_empty_group=False, detail_override=None):
+        self.name = name
+        self.source = source or name
+        self.origin = origin
+        self.children = children
+        self.keep_empty_group = keep_empty_group
+        self.detail_override = detail_override
+
+
+PROFILE_SCHEMA = (
+    SchemaField('FullName'),
+    SchemaField('Address', children=(
+        SchemaField('Name'),
+        SchemaField('Line1'),
+        SchemaField('Line2'),
+        SchemaField('Line3'),
+        SchemaField('City'),
+        SchemaField('State'),
+        SchemaField('ZipCode'),
+    ), detail_override='Address'),
+    SchemaField('Locations'),
+    SchemaField('Phone', children=(
+        SchemaField('AreaCode'),
+        SchemaField('Number'),
+        SchemaField('Extension'),
+    ), keep_empty_group=True),
+    SchemaField('Email'),
+    SchemaField('Website'),
+    SchemaField('Insurance/Payment', origin='details'),
+    SchemaField('Specialties', origin='details'),
+)
+
+
+def prune_value(value):
+    """Return a copy of a JSON-like value without empty entries, using an explicit stack.
+
+    Matches `remove_empty_fields`: empty values are dropped based on the original
+    value, and a nested 'Address' dict whose values are all falsy is removed.
+    """
+    if value.__class__ is dict:
+        result = {}
+    elif value.__class__ is list:
+        result = []
+    else:
+        return value
+
+    stack = [(value, result)]
+    while stack:
+        source, target = stack.pop()
+        if source.__class__ is dict:
+            address = source.get('Address')
+            drop_address = address.__class__ is dict and not any(address.values())
+            items = source.items()
+        else:
+            drop_address = False
+            items = enumerate(source)
+
+        for key, item in items:
+            if item is None or (not item and item.__class__ in EMPTY_TYPES):
+                continue
+            if drop_address and key == 'Address':
+                continue
+            if item.__class__ in CONTAINER_TYPES:
+                child = {} if item.__class__ is dict else []
+                stack.append((item, child))
+                item = child
+            if target.__class__ is dict:
+                target[key] = item
+            else:
+                target.append(item)
+
+    return result
+
+
+def _value_lines(target, key, expression, indent):
+    """Source lines that read `expression` and store it in `target[key]` unless empty.
+
+    An 'Address' dict whose values are all falsy also counts as empty, as in `prune_value`.
+    """
+    pad = ' ' * indent
+    condition = "value is not None and (value or value.__class__ not in EMPTY_TYPES)"
+    if key == 'Address':
+        condition += " and not (value.__class__ is dict and not any(value.values()))"
+    return [
+        f"{pad}value = {expression}",
+        f"{pad}if {condition}:",
+        f"{pad}    {target}[{key!r}] = prune_value(value) if value.__class__ in CONTAINER_TYPES else value",
+    ]
+
+
+def compile_normalizer(schema, include_address=False):
+    """Compile `schema` into a flat `normalize(profile, details)` function.
+
+    Args:
+        schema (tuple): The `SchemaField` declarations of the record.
+        include_address (bool): Take fields with a `detail_override` from the detail page.
+
+    Returns:
+        function: normalize(profile, details) -> dict, the cleaned record.
+    """
+    lines = ["def normalize(profile, details):", "    record = {}"]
+    for field in schema:
+        if include_address and field.detail_override:
+            lines += _value_lines('record', field.name, f"details[{field.detail_override!r}] or []", 4)
+        elif field.origin == 'details':
+            lines += _value_lines('record', field.name, f"details[{field.source!r}] or []", 4)
+        elif field.children:
+            lines += [
+                f"    group = profile.get({field.source!r})",
+                "    if group is None:",
+                "        group = {}",
+                "    nested = {}",
+                "    any_set = False",
+            ]
+            for child in field.children:
+                lines += [
+                    f"    value = group.get({child.source!r}, '')",
+                    "    if value:",
+                    "        any_set = True",
+                    "    if value is not None and (value or value.__class__ not in EMPTY_TYPES):",
+                    f"        nested[{child.name!r}] = prune_value(value) if value.__class__ in CONTAINER_TYPES else value",
+                ]
+            condition = "True" if field.keep_empty_group else "any_set"
+            lines += [f"    if {condition}:", f"        record[{field.name!r}] = nested"]
+        else:
+            lines += _value_lines('record', field.name, f"profile.get({field.source!r}, '')", 4)
+    lines.append("    return record")
+
+    namespace = {'EMPTY_TYPES': EMPTY_TYPES, 'CONTAINER_TYPES': CONTAINER_TYPES, 'prune_value': prune_value}
+    exec(compile('\n'.join(lines), f"<normalizer include_address={include_address}>", 'exec'), namespace)
+    return namespace['normalize']
+
+
+@lru_cache(maxsize=None)
+def get_profile_normalizer(include_address=False):
+    """Return the compiled normalizer for `PROFILE_SCHEMA`, compiling it on first use."""
+    return compile_normalizer(PROFILE_SCHEMA, include_address=include_address)
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Statuses that mean the server wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) into a delay in seconds.
+
+    Returns:
+        float or None: The delay in seconds, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Asyncio rate limiter that adapts its rate with AIMD.
+
+    Requests are spaced evenly at the current rate. Every fast, successful response
+    raises the rate additively; a 429/503, a failed request or a latency spike cuts it
+    multiplicatively. A Retry-After header pauses every request on this limiter until it
+    has passed. The rate always stays between `min_rate` and `max_rate`.
+
+    Rates are expressed as requests per `per` seconds, like `aiolimiter.AsyncLimiter`,
+    and the limiter is used the same way: `async with limiter: ...`.
+    """
+
+    def __init__(
+        self,
+        rate=10,
+        per=60,
+        min_rate=2,
+        max_rate=60,
+        increase=1,
+        decrease=0.5,
+        latency_factor=3.0,
+        cooldown=5.0,
+        name='default'
+    ):
+        """
+        Args:
+            rate (float): Starting number of requests per `per` seconds.
+            per (float): Length of the rate window in seconds. Defaults to 60.
+            min_rate (float): Floor for the adaptive rate.
+            max_rate (float): Ceiling for the adaptive rate.
+            increase (float): Rate added after each fast, successful response.
+            decrease (float): Factor applied to the rate when the server pushes back.
+            latency_factor (float): A response slower than this multiple of the average
+                latency counts as a latency spike.
+            cooldown (float): Minimum seconds between two decreases, so a burst of
+                in-flight failures only cuts the rate once.
+            name (str): Name used in log messages.
+        """
+        self.per = per
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.name = name
+        self.average_latency = None
+        self._next_slot = 0.0
+        self._blocked_until = 0.0
+        self._last_decrease = float('-inf')
+
+    @classmethod
+    def from_config(cls, settings, name='default'):
+        """Build a limiter from a `rate_limits` entry of config.json."""
+        return cls(name=name, **settings)
+
+    @property
+    def interval(self):
+        """Seconds between two requests at the current rate."""
+        return self.per / self.rate
+
+    async def acquire(self):
+        """Wait until the next request slot is free and take it."""
+        while True:
+            now = time.monotonic()
+            wait = max(self._next_slot, self._blocked_until) - now
+            if wait <= 0:
+                self._next_slot = now + self.interval
+                return
+            await asyncio.sleep(wait)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def record(self, status=None, latency=None, retry_after=None):
+        """Feed the outcome of a request back into the limiter.
+
+        Args:
+            status (int, optional): The HTTP status, or None if the request failed
+                without a response (timeout, connection error).
+            latency (float, optional): Seconds the request took.
+            retry_after (str or float, optional): The Retry-After header, if any.
+        """
+        delay = parse_retry_after(retry_after) if isinstance(retry_after, str) else retry_after
+        if delay:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            logging.warning(f"Rate limiter '{self.name}': pausing for {delay:.1f}s (Retry-After).")
+
+        spike = (
+            latency is not None
+            and self.average_latency is not None
+            and latency > self.average_latency * self.latency_factor
+        )
+        if latency is not None:
+            self.average_latency = latency if self.average_latency is None else 0.8 * self.average_latency + 0.2 * latency
+
+        if status is None or status in THROTTLE_STATUSES or spike:
+            self._slow_down()
+        elif status < 400:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def _slow_down(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        logging.info(f"Rate limiter '{self.name}': rate lowered to {self.rate:.1f} requests per {self.per}s.")
+
+
+class BlockingRateLimiter:
+    """Thread-safe rate limiter for blocking clients such as `requests`.
+
+    Calls are spaced evenly at `rate` per `per` seconds across every thread that shares
+    the limiter; each caller reserves the next free slot and sleeps until it comes up.
+    """
+
+    def __init__(self, rate, per=1.0, name='default'):
+        self.rate = rate
+        self.per = per
+        self.name = name
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    @property
+    def interval(self):
+        """Seconds between two requests."""
+        return self.per / self.rate
+
+    def acquire(self):
+        """Block until the next request slot comes up and take it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
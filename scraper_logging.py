@@ -0,0 +1,154 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+def setup_logging(log_file=None, console=True, level=logging.INFO, fmt=LOG_FORMAT):
+    """Send all log records through a queue to handlers running on a background thread.
+
+    The root logger only gets a `QueueHandler`, so logging calls from the scraping code
+    never wait on disk or console writes; a `QueueListener` thread does the writing.
+
+    Args:
+        log_file (str, optional): Path of the log file. No file is written if omitted.
+        console (bool): Whether to also log to the console. Defaults to True.
+        level (int): The root logging level. Defaults to INFO.
+        fmt (str): The log line format.
+
+    Returns:
+        QueueListener: The running listener; it is stopped automatically at exit.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(fmt)
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush the queued log records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RecordLogger:
+    """Logs high-volume per-record events with sampling and rate caps, or as summaries.
+
+    Normal mode: each event name logs every `sample_every`-th occurrence, at most
+    `max_per_interval` times per `interval` seconds. Suppressed messages are counted and
+    reported in one line when the interval rolls over.
+
+    Bulk mode: per-record messages are dropped and one summary line with the count of
+    every event is logged each `interval` seconds instead.
+
+    Messages take logging-style arguments, so suppressed ones are never formatted.
+    """
+
+    def __init__(self, logger=None, bulk=False, interval=30.0, max_per_interval=20, sample_every=1):
+        self.logger = logger or logging.getLogger()
+        self.totals = Counter()
+        self._lock = threading.Lock()
+        self.configure(bulk=bulk, interval=interval, max_per_interval=max_per_interval, sample_every=sample_every)
+
+    def configure(self, bulk=False, interval=30.0, max_per_interval=20, sample_every=1):
+        """Change the sampling settings, e.g. from the `logging` section of config.json."""
+        with self._lock:
+            self.bulk = bulk
+            self.interval = interval
+            self.max_per_interval = max_per_interval
+            self.sample_every = max(1, sample_every)
+            self._reset_window(time.monotonic())
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._window = Counter()
+        self._emitted = Counter()
+        self._suppressed = Counter()
+
+    def event(self, name, msg=None, *args, level=logging.INFO):
+        """Count one occurrence of event `name` and log `msg % args` if the sampling allows it."""
+        with self._lock:
+            summary = self._roll()
+            self.totals[name] += 1
+            self._window[name] += 1
+            emit = (
+                not self.bulk
+                and msg is not None
+                and (self._window[name] - 1) % self.sample_every == 0
+                and self._emitted[name] < self.max_per_interval
+            )
+            if emit:
+                self._emitted[name] += 1
+            elif msg is not None and not self.bulk:
+                self._suppressed[name] += 1
+
+        if summary:
+            self.logger.info(summary)
+        if emit:
+            self.logger.log(level, msg, *args)
+
+    def count(self, name, amount=1):
+        """Add `amount` to the counter of event `name` without logging a message."""
+        with self._lock:
+            summary = self._roll()
+            self.totals[name] += amount
+            self._window[name] += amount
+        if summary:
+            self.logger.info(summary)
+
+    def _roll(self):
+        now = time.monotonic()
+        if now - self._window_start < self.interval:
+            return None
+        summary = self._summary(now - self._window_start)
+        self._reset_window(now)
+        return summary
+
+    def _summary(self, elapsed):
+        if self.bulk and self._window:
+            counts = ', '.join(f"{name}={count}" for name, count in sorted(self._window.items()))
+            return f"Last {elapsed:.0f}s: {counts}"
+        if self._suppressed:
+            counts = ', '.join(f"{name}={count}" for name, count in sorted(self._suppressed.items()))
+            return f"Suppressed per-record messages in the last {elapsed:.0f}s: {counts}"
+        return None
+
+    def flush(self):
+        """Log the pending window summary and the run totals."""
+        with self._lock:
+            summary = self._summary(time.monotonic() - self._window_start)
+            self._reset_window(time.monotonic())
+            totals = ', '.join(f"{name}={count}" for name, count in sorted(self.totals.items()))
+        if summary:
+            self.logger.info(summary)
+        if totals:
+            self.logger.info(f"Run totals: {totals}")
@@ -1,4 +1,10 @@
+import csv
 import json
+import logging
+import math
+import os
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 
 # state list available on eat-right
 states = [
@@ -66,6 +72,10 @@ states = [
 ]
 
 
+# Offline table of populated (standard and PO box) ZIP codes and their centroids shipped with the repo
+POPULATED_ZIPS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zip_codes.csv')
+
+
 # Load configuration from config.json
 def load_config():
     with open('config.json', 'r') as file:
@@ -96,25 +106,176 @@ def generate_zip_code_lists(start, end, chunk_size, excluded_ranges):
 
     return zip_code_lists
 
-# Load configuration and extract parameters
-config = load_config()
-zip_info = config.get("zip_info", {})
-start_zip = zip_info.get("start_zip", 501)
-end_zip = zip_info.get("end_zip", 99950)
-chunk_size = zip_info.get("chunk_size", 500)
-excluded_ranges = zip_info.get("excluded_ranges", [])
-zip_list_number = zip_info.get("zip_list_number", 1)  # Default to 1 if zip_list_number is not found
+# Compute the bounds of a single ZIP list without generating the others
+def get_zip_chunk_bounds(list_number, start, end, chunk_size, excluded_ranges):
+    """Return the (first, last) ZIP code of list `zip_<list_number>`, or None if it does not exist.
+
+    Lists are numbered exactly like `generate_zip_code_lists`, skipping excluded chunks.
+    """
+    current_number = 0
+    for current_start in range(start, end + 1, chunk_size):
+        current_end = min(current_start + chunk_size - 1, end)
+        if any(excl_start <= current_end and excl_end >= current_start for excl_start, excl_end in excluded_ranges):
+            continue
+        current_number += 1
+        if current_number == list_number:
+            return current_start, current_end
+    return None
+
+@lru_cache(maxsize=None)
+def load_populated_zips(file_path=POPULATED_ZIPS_FILE):
+    """Load the populated ZIP table as a sorted tuple of integer ZIP codes."""
+    with open(file_path, newline='') as file:
+        return tuple(sorted(int(row['zip']) for row in csv.DictReader(file)))
+
+def plan_zip_codes(list_number=None, populated_only=None, zip_info=None):
+    """Return the ZIP codes to query for one list, dropping codes that are not populated.
+
+    Args:
+        list_number (int, optional): The list to plan. Defaults to `zip_list_number` in config.json.
+        populated_only (bool, optional): Keep only ZIP codes found in the populated table.
+            Defaults to `populated_only` in config.json, or True.
+        zip_info (dict, optional): The `zip_info` config section. Read from config.json if omitted.
+
+    Returns:
+        list: The 5-digit ZIP code strings of the list, or None if the list does not exist.
+    """
+    if zip_info is None:
+        zip_info = load_config().get("zip_info", {})
+    if list_number is None:
+        list_number = zip_info.get("zip_list_number", 1)
+    if populated_only is None:
+        populated_only = zip_info.get("populated_only", True)
+
+    bounds = get_zip_chunk_bounds(
+        list_number,
+        zip_info.get("start_zip", 501),
+        zip_info.get("end_zip", 99950),
+        zip_info.get("chunk_size", 500),
+        zip_info.get("excluded_ranges", []),
+    )
+    if bounds is None:
+        return None
+    first, last = bounds
+
+    if populated_only:
+        try:
+            populated = load_populated_zips()
+        except FileNotFoundError:
+            logging.warning(f"Populated ZIP table '{POPULATED_ZIPS_FILE}' not found. Querying every ZIP in the range.")
+        else:
+            return [f"{zip_code:05d}" for zip_code in populated[bisect_left(populated, first):bisect_right(populated, last)]]
 
-# Generate the ZIP code lists
-zip_code_lists = generate_zip_code_lists(start_zip, end_zip, chunk_size, excluded_ranges)
+    return [f"{zip_code:05d}" for zip_code in range(first, last + 1)]
+
+@lru_cache(maxsize=None)
+def load_zip_centroids(file_path=POPULATED_ZIPS_FILE):
+    """Load the populated ZIP table as a mapping of 5-digit ZIP code to (lat, lon)."""
+    with open(file_path, newline='') as file:
+        return {row['zip']: (float(row['lat']), float(row['lon'])) for row in csv.DictReader(file)}
+
+def haversine_miles(point_a, point_b):
+    """Great-circle distance in miles between two (lat, lon) points."""
+    lat_a, lon_a = map(math.radians, point_a)
+    lat_b, lon_b = map(math.radians, point_b)
+    a = math.sin((lat_b - lat_a) / 2) ** 2 + math.cos(lat_a) * math.cos(lat_b) * math.sin((lon_b - lon_a) / 2) ** 2
+    return 2 * 3958.8 * math.asin(math.sqrt(a))
+
+def plan_coverage(zip_codes, radius_miles, radius_factor=0.8, target_coverage=1.0):
+    """Choose a near-minimal set of query ZIP codes whose search radius covers `zip_codes`.
+
+    A query ZIP covers every target ZIP whose centroid lies within
+    `radius_miles * radius_factor` of its own centroid; the factor leaves a margin for
+    the area of each ZIP around its centroid. Query ZIPs are picked greedily (largest
+    number of still uncovered targets first) until `target_coverage` is reached.
+    ZIP codes without a known centroid are always queried.
+
+    Args:
+        zip_codes (list): The target ZIP codes.
+        radius_miles (float): The search radius of the API around the queried ZIP.
+        radius_factor (float): Share of the radius counted as reliably covered. Defaults to 0.8.
+        target_coverage (float): Fraction of targets to cover before stopping. Defaults to 1.0.
+
+    Returns:
+        tuple: (query ZIP codes in greedy order, stats dict with 'targets', 'queries',
+            'coverage' and 'reduction').
+    """
+    centroids = load_zip_centroids()
+    located = [zip_code for zip_code in zip_codes if zip_code in centroids]
+    unlocated = [zip_code for zip_code in zip_codes if zip_code not in centroids]
+    reach = radius_miles * radius_factor
+
+    covers = {
+        candidate: {
+            target for target in located
+            if haversine_miles(centroids[candidate], centroids[target]) <= reach
+        }
+        for candidate in located
+    }
+
+    uncovered = set(located)
+    needed = target_coverage * len(zip_codes) - len(unlocated)
+    covered_count = 0
+    query_zips = []
+    while uncovered and covered_count < needed:
+        best = max(covers, key=lambda candidate: len(covers[candidate] & uncovered))
+        newly_covered = covers.pop(best) & uncovered
+        if not newly_covered:
+            break
+        query_zips.append(best)
+        uncovered -= newly_covered
+        covered_count += len(newly_covered)
+
+    query_zips.extend(unlocated)
+    total = len(zip_codes)
+    stats = {
+        'targets': total,
+        'queries': len(query_zips),
+        'coverage': (covered_count + len(unlocated)) / total if total else 1.0,
+        'reduction': 1 - len(query_zips) / total if total else 0.0,
+    }
+    return query_zips, stats
 
 # Function to access a specific ZIP code list by name
 def get_zip_code_list_by_name(name):
-    for list_name, zip_code_list in zip_code_lists:
-        if list_name == name:
-            return zip_code_list
-    return None
+    try:
+        list_number = int(name.rsplit("_", 1)[1])
+    except (IndexError, ValueError):
+        return None
+    return plan_zip_codes(list_number, populated_only=False)
+
+# `cities` and `zip_code_lists` are built on first access, so importing this module stays cheap
+def __getattr__(name):
+    if name == "cities":
+        return plan_zip_codes()
+    if name == "zip_code_lists":
+        zip_info = load_config().get("zip_info", {})
+        return generate_zip_code_lists(
+            zip_info.get("start_zip", 501),
+            zip_info.get("end_zip", 99950),
+            zip_info.get("chunk_size", 500),
+            zip_info.get("excluded_ranges", []),
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-# Retrieve the ZIP list number and get the corresponding list
-specific_list_name = f"zip_{zip_list_number}"
-cities = get_zip_code_list_by_name(specific_list_name)
+if __name__ == "__main__":
+    zip_info = load_config().get("zip_info", {})
+    list_number = zip_info.get("zip_list_number", 1)
+    all_codes = plan_zip_codes(list_number, populated_only=False, zip_info=zip_info)
+    planned = plan_zip_codes(list_number, zip_info=zip_info)
+    if planned is None:
+        print(f"zip_{list_number} does not exist.")
+    else:
+        print(f"zip_{list_number}: {all_codes[0]}-{all_codes[-1]}, {len(planned)} of {len(all_codes)} ZIP codes are populated.")
+        coverage = zip_info.get("coverage", {})
+        if coverage.get("enabled"):
+            query_zips, stats = plan_coverage(
+                planned,
+                coverage.get("radius_miles", 10),
+                coverage.get("radius_factor", 0.8),
+                coverage.get("target_coverage", 1.0),
+            )
+            print(f"Coverage plan: {stats['queries']} of {stats['targets']} ZIP queries "
+                  f"({stats['reduction']:.0%} fewer), estimated coverage {stats['coverage']:.1%}.")
+    print(f"{len(states)} states available.")